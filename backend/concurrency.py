@@ -0,0 +1,82 @@
+import asyncio
+import functools
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+
+class QueueFullError(RuntimeError):
+    """Raised when a bounded queue cannot accept more work."""
+
+
+class BoundedExecutor:
+    def __init__(self, max_workers: int, max_pending: int, name: str = "worker"):
+        """
+        Thread pool with a limit on the number of submitted but unfinished tasks.
+
+        Blocking work such as model inference runs here instead of on the event
+        loop. Once ``max_pending`` tasks are waiting or running, new submissions
+        are rejected with ``QueueFullError`` instead of queueing without bound.
+
+        Args:
+            max_workers (int): Number of worker threads.
+            max_pending (int): Maximum number of tasks waiting or running.
+            name (str, optional): Thread name prefix. Defaults to "worker".
+        """
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+
+    async def run(self, fn, *args, **kwargs):
+        """
+        Run ``fn(*args, **kwargs)`` on the pool and wait for its result.
+
+        Raises:
+            QueueFullError: If ``max_pending`` tasks are already waiting or running.
+        """
+        if self.pending >= self.max_pending:
+            raise QueueFullError(f"{self.pending} tasks pending")
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+        finally:
+            self.pending -= 1
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class AdmissionLimiter:
+    def __init__(self, max_concurrency: int, max_queue: int):
+        """
+        Limit how many requests run at once and how many may wait for a slot.
+
+        Args:
+            max_concurrency (int): Requests allowed to run at the same time.
+            max_queue (int): Requests allowed to wait for a slot; further requests are rejected.
+        """
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    @asynccontextmanager
+    async def slot(self):
+        """
+        Hold a slot for the duration of the ``async with`` block.
+
+        Raises:
+            QueueFullError: If ``max_queue`` requests are already waiting.
+        """
+        if self._semaphore.locked() and self.waiting >= self.max_queue:
+            raise QueueFullError(f"{self.waiting} requests waiting")
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        try:
+            yield
+        finally:
+            self._semaphore.release()
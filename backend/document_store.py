@@ -0,0 +1,66 @@
+import os
+import json
+import threading
+
+from config.config import FILE_DOCUMENTS
+
+
+class DocumentStore:
+    def __init__(self, path: str = FILE_DOCUMENTS):
+        """
+        Lookup of document metadata by document id.
+
+        Pages in the JSONL file and in Qdrant only carry a ``doc_id``; the
+        file name, author, dates, size and location of each document are stored
+        once in ``path`` by ``MinioExtract``. The file is loaded on first use and
+        reloaded when its modification time changes, so a new extraction is
+        picked up without restarting the service.
+
+        Args:
+            path (str, optional): The documents file. Defaults to FILE_DOCUMENTS.
+        """
+        self.path = path
+        self._documents = {}
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    @property
+    def documents(self) -> dict:
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return self._documents
+        if mtime != self._mtime:
+            with self._lock:
+                if mtime != self._mtime:
+                    with open(self.path, encoding="utf-8") as f:
+                        self._documents = json.load(f)
+                    self._mtime = mtime
+        return self._documents
+
+    def get(self, doc_id: str) -> dict:
+        """
+        Args:
+            doc_id (str): The id of the document.
+
+        Returns:
+            dict: The metadata of the document, or an empty dict if it is unknown.
+        """
+        return self.documents.get(doc_id, {})
+
+    def join(self, results: list) -> list:
+        """
+        Add the metadata of its document to the payload of every result.
+
+        Args:
+            results (list): Search results with ``payload`` and ``score``.
+
+        Returns:
+            list: New results whose payload holds the document metadata and the
+            page fields, in the same order.
+        """
+        documents = self.documents
+        return [
+            {"payload": {**documents.get(hit["payload"].get("doc_id"), {}), **hit["payload"]}, "score": hit["score"]}
+            for hit in results
+        ]
@@ -0,0 +1,124 @@
+import time
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from config.config import QUERY_CACHE_MAX_ENTRIES, QUERY_CACHE_MAX_BYTES, QUERY_CACHE_TTL
+
+
+class QueryEmbeddingCache:
+    def __init__(
+        self,
+        max_entries: int = QUERY_CACHE_MAX_ENTRIES,
+        max_bytes: int = QUERY_CACHE_MAX_BYTES,
+        ttl: float = QUERY_CACHE_TTL,
+    ):
+        """
+        In-memory LRU cache mapping normalized query text to its embedding vector.
+
+        Entries are evicted when the cache holds more than ``max_entries`` vectors,
+        when the stored vectors exceed ``max_bytes``, or when an entry is older than
+        ``ttl`` seconds. Every entry belongs to a model key; a lookup with a
+        different model key clears the cache so a model swap never serves stale
+        vectors.
+
+        Args:
+            max_entries (int, optional): Maximum number of cached vectors.
+            max_bytes (int, optional): Maximum total size of cached vectors in bytes.
+            ttl (float, optional): Time to live of an entry in seconds. 0 disables expiry.
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._model_key = None
+        self._lock = threading.Lock()
+
+    def _check_model(self, model_key: str) -> None:
+        if model_key != self._model_key:
+            self._entries.clear()
+            self._bytes = 0
+            self._model_key = model_key
+
+    def _pop(self, text: str) -> None:
+        vector, _ = self._entries.pop(text)
+        self._bytes -= vector.nbytes
+
+    def get(self, text: str, model_key: str):
+        """
+        Look up the vector of a normalized query.
+
+        Args:
+            text (str): Normalized query text.
+            model_key (str): Identity of the model that would encode the query.
+
+        Returns:
+            numpy.ndarray | None: The cached vector, or None on a miss.
+        """
+        with self._lock:
+            self._check_model(model_key)
+            entry = self._entries.get(text)
+            if entry is None:
+                self.misses += 1
+                return None
+            vector, stored_at = entry
+            if self.ttl and time.monotonic() - stored_at > self.ttl:
+                self._pop(text)
+                self.evictions += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(text)
+            self.hits += 1
+            return vector
+
+    def put(self, text: str, model_key: str, vector) -> None:
+        """
+        Store the vector of a normalized query, evicting the least recently used entries.
+
+        Args:
+            text (str): Normalized query text.
+            model_key (str): Identity of the model that encoded the query.
+            vector (array-like): Embedding vector of the query.
+        """
+        # copy เสมอ vector จาก micro-batch เป็น view ของทั้ง batch ซึ่งจะค้างอยู่ใน memory ไปด้วย
+        vector = np.array(vector, dtype=np.float32, copy=True)
+        vector.setflags(write=False)
+        if vector.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            self._check_model(model_key)
+            if text in self._entries:
+                self._pop(text)
+            self._entries[text] = (vector, time.monotonic())
+            self._bytes += vector.nbytes
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._pop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Remove every cached vector."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        """
+        Returns:
+            dict: Hit/miss counters and current size of the cache.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "model_key": self._model_key,
+            }
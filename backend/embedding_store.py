@@ -0,0 +1,196 @@
+import os
+import json
+import hashlib
+import threading
+
+import numpy as np
+
+from config.config import EMBEDDING_STORE_DIR, EMBEDDING_STORE_COMPACT_RATIO
+
+DIGEST_SIZE = 32
+
+
+def content_digest(text: str) -> bytes:
+    """
+    Args:
+        text (str): A passage.
+
+    Returns:
+        bytes: The SHA-256 digest of the UTF-8 encoded passage.
+    """
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+class EmbeddingStore:
+    def __init__(self, model_key: str, directory: str = EMBEDDING_STORE_DIR, compact_ratio: float = EMBEDDING_STORE_COMPACT_RATIO):
+        """
+        Persistent cache of passage vectors, addressed by the hash of the passage.
+
+        Each model has its own sub-directory, so vectors of different models or
+        model versions are never mixed. A generation of the store is two files
+        with one row per passage: ``keys-<gen>.bin`` holds the 32-byte content
+        digests and ``vectors-<gen>.bin`` the float32 vectors, read through a
+        memory map. ``meta.json`` records the generation and the number of
+        committed rows; rows written after it (for example by a run that was
+        killed) are ignored and cut off on the next load.
+
+        Args:
+            model_key (str): Stable name and version of the model, see ``model_version``.
+            directory (str, optional): Root directory of the store. Defaults to EMBEDDING_STORE_DIR.
+            compact_ratio (float, optional): ``compact`` only rewrites the files when at least
+                this fraction of the rows is unreferenced. Defaults to EMBEDDING_STORE_COMPACT_RATIO.
+        """
+        self.model_key = model_key
+        self.compact_ratio = compact_ratio
+        self.path = os.path.join(directory, hashlib.sha1(model_key.encode("utf-8")).hexdigest()[:16])
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.path, exist_ok=True)
+        self._load()
+
+    def _file(self, name: str, generation: int = None) -> str:
+        generation = self.meta["generation"] if generation is None else generation
+        return os.path.join(self.path, f"{name}-{generation}.bin")
+
+    def _load(self) -> None:
+        try:
+            with open(os.path.join(self.path, "meta.json"), encoding="utf-8") as f:
+                self.meta = json.load(f)
+        except (OSError, ValueError):
+            self.meta = {}
+        if self.meta.get("model_key") != self.model_key:
+            self.meta = {"model_key": self.model_key, "generation": 0, "rows": 0, "dim": None}
+
+        rows, dim = self.meta["rows"], self.meta["dim"]
+        for name, width in (("keys", DIGEST_SIZE), ("vectors", (dim or 0) * 4)):
+            with open(self._file(name), "ab") as f:
+                f.truncate(rows * width)
+        with open(self._file("keys"), "rb") as f:
+            data = f.read()
+        self._rows = {data[i:i + DIGEST_SIZE]: row for row, i in enumerate(range(0, len(data), DIGEST_SIZE))}
+        self._map()
+
+    def _map(self) -> None:
+        rows, dim = self.meta["rows"], self.meta["dim"]
+        self._vectors = np.memmap(self._file("vectors"), dtype=np.float32, mode="r", shape=(rows, dim)) if rows else None
+
+    def _save_meta(self) -> None:
+        tmp_path = os.path.join(self.path, "meta.json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.meta, f)
+        os.replace(tmp_path, os.path.join(self.path, "meta.json"))
+
+    def __len__(self) -> int:
+        return self.meta["rows"]
+
+    def lookup(self, digests: list) -> np.ndarray:
+        """
+        Args:
+            digests (list): Content digests of the passages.
+
+        Returns:
+            numpy.ndarray: The row of each digest, or -1 where it is not stored.
+        """
+        with self._lock:
+            rows = np.array([self._rows.get(digest, -1) for digest in digests], dtype=np.int64)
+        found = int((rows >= 0).sum())
+        self.hits += found
+        self.misses += len(rows) - found
+        return rows
+
+    def take(self, rows: np.ndarray) -> np.ndarray:
+        """
+        Args:
+            rows (numpy.ndarray): Rows returned by ``lookup``, all of them stored.
+
+        Returns:
+            numpy.ndarray: A copy of the vectors of the rows.
+        """
+        with self._lock:
+            return np.array(self._vectors[rows])
+
+    def add(self, digests: list, vectors: np.ndarray) -> np.ndarray:
+        """
+        Append vectors to the store. Digests that are already stored are skipped.
+
+        Args:
+            digests (list): Content digests of the passages.
+            vectors (numpy.ndarray): The vectors of the passages, in the same order.
+
+        Returns:
+            numpy.ndarray: The row of each digest.
+        """
+        if not len(digests):
+            return np.empty(0, dtype=np.int64)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._lock:
+            if self.meta["dim"] is None:
+                self.meta["dim"] = vectors.shape[1]
+            elif vectors.shape[1] != self.meta["dim"]:
+                raise ValueError(f"Vectors of size {vectors.shape[1]} do not match the store ({self.meta['dim']})")
+
+            new = {}
+            for i, digest in enumerate(digests):
+                if digest not in self._rows and digest not in new:
+                    new[digest] = i
+            if new:
+                index = list(new.values())
+                with open(self._file("keys"), "ab") as f:
+                    f.write(b"".join(new))
+                with open(self._file("vectors"), "ab") as f:
+                    f.write(np.ascontiguousarray(vectors[index]).tobytes())
+                rows = self.meta["rows"]
+                for row, digest in enumerate(new, start=rows):
+                    self._rows[digest] = row
+                self.meta["rows"] = rows + len(new)
+                self._save_meta()
+                self._map()
+            return np.array([self._rows[digest] for digest in digests], dtype=np.int64)
+
+    def compact(self, keep: set) -> int:
+        """
+        Drop the vectors of passages that are no longer referenced.
+
+        The remaining rows are written to a new generation of files, which
+        ``meta.json`` switches to in one atomic replace; the files of the old
+        generation are deleted afterwards. Nothing is rewritten while less than
+        ``compact_ratio`` of the rows would be dropped.
+
+        Args:
+            keep (set): Content digests of every passage still in the corpus.
+
+        Returns:
+            int: The number of rows dropped.
+        """
+        with self._lock:
+            kept = sorted(row for digest, row in self._rows.items() if digest in keep)
+            removed = self.meta["rows"] - len(kept)
+            if not removed or removed < self.compact_ratio * self.meta["rows"]:
+                return 0
+
+            old_generation = self.meta["generation"]
+            generation = old_generation + 1
+            digests = [digest for digest, row in sorted(self._rows.items(), key=lambda item: item[1]) if digest in keep]
+            with open(self._file("keys", generation), "wb") as f:
+                f.write(b"".join(digests))
+            with open(self._file("vectors", generation), "wb") as f:
+                if kept:
+                    f.write(np.ascontiguousarray(self._vectors[kept]).tobytes())
+
+            self.meta = {**self.meta, "generation": generation, "rows": len(kept)}
+            self._save_meta()
+            self._rows = {digest: row for row, digest in enumerate(digests)}
+            self._vectors = None
+            self._map()
+            for name in ("keys", "vectors"):
+                os.remove(self._file(name, old_generation))
+            return removed
+
+    def stats(self) -> dict:
+        return {
+            "rows": self.meta["rows"],
+            "dim": self.meta["dim"],
+            "hits": self.hits,
+            "misses": self.misses,
+        }
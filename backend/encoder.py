@@ -0,0 +1,165 @@
+import os
+import hashlib
+
+import numpy as np
+
+from config.config import EMBEDDING_MODEL, ENCODER_BACKEND, ENCODER_DEVICE, ENCODER_THREADS
+from config.logging_config.modern_log import LoggingConfig
+
+# ---------------------------------------------------------------------------- #
+#                                LOGGING CONFIG                                #
+# ---------------------------------------------------------------------------- #
+logger = LoggingConfig(level="INFO").get_logger("encoder")
+# ---------------------------------------------------------------------------- #
+
+BACKENDS = ("torch", "onnx", "int8")
+
+PARITY_TEXTS = [
+    "อาชีพที่สามารถประกอบได้หลังสำเร็จการศึกษา",
+    "โครงสร้างหลักสูตรและจำนวนหน่วยกิตตลอดหลักสูตร",
+    "คุณสมบัติของผู้เข้าศึกษา",
+    "Program learning outcomes (PLO) of the curriculum",
+    "Bachelor of Science in Computer Science, revised curriculum 2023",
+    "ผลลัพธ์การเรียนรู้ที่คาดหวังของหลักสูตร PLO 1-5",
+]
+
+
+def resolve_device(device: str = "auto") -> str:
+    """
+    Args:
+        device (str, optional): "auto", "cuda" or "cpu". Defaults to "auto".
+
+    Returns:
+        str: "cuda" when ``device`` is "auto" and a GPU is available, "cpu" when it
+        is not, otherwise ``device`` itself.
+    """
+    if device != "auto":
+        return device
+    import torch
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def model_revision(model: object, model_name: str) -> str:
+    """
+    Find the version of the loaded model weights.
+
+    Args:
+        model (object): A loaded sentence transformer model.
+        model_name (str): The name or path the model was loaded from.
+
+    Returns:
+        str: The commit hash of a model downloaded from the Hugging Face Hub, a
+        digest of the file names, sizes and modification times of a local model
+        directory, or None if neither is known.
+    """
+    try:
+        config = model[0].auto_model.config
+    except (AttributeError, IndexError, TypeError):
+        config = None
+    # transformers เก็บ commit ที่ resolve จาก Hub ไว้ใน config ตอนโหลด
+    commit = getattr(config, "_commit_hash", None)
+    if commit:
+        return commit
+    revision = getattr(getattr(model, "model_card_data", None), "base_model_revision", None)
+    if revision:
+        return revision
+    if os.path.isdir(model_name):
+        digest = hashlib.sha1()
+        for root, dirs, files in os.walk(model_name):
+            dirs.sort()
+            for name in sorted(files):
+                stat = os.stat(os.path.join(root, name))
+                digest.update(f"{os.path.relpath(os.path.join(root, name), model_name)}\x00{stat.st_size}\x00{stat.st_mtime_ns}\n".encode("utf-8"))
+        return digest.hexdigest()[:12]
+    return None
+
+
+def load_encoder(
+    model_name: str = EMBEDDING_MODEL,
+    backend: str = ENCODER_BACKEND,
+    device: str = ENCODER_DEVICE,
+    threads: int = ENCODER_THREADS,
+) -> object:
+    """
+    Load the embedding model with one of the inference backends.
+
+    - "torch": the reference PyTorch model, on the GPU when there is one.
+    - "onnx": the model exported to ONNX and run with ONNX Runtime on the CPU.
+      Requires ``pip install optimum[onnxruntime]``; the export is made on first
+      use if the model repository has none.
+    - "int8": the PyTorch model with its linear layers dynamically quantized to
+      int8, on the CPU.
+
+    The returned model gets a ``model_key`` naming the model, its revision (see
+    ``model_revision``) and the backend, so cached query vectors and the on-disk
+    embedding store never mix vectors of different backends or model versions.
+
+    Args:
+        model_name (str, optional): Name or path of the model. Defaults to EMBEDDING_MODEL.
+        backend (str, optional): "torch", "onnx" or "int8". Defaults to ENCODER_BACKEND.
+        device (str, optional): "auto", "cuda" or "cpu"; only used by the torch backend. Defaults to ENCODER_DEVICE.
+        threads (int, optional): CPU threads used by inference, 0 keeps the library default. Defaults to ENCODER_THREADS.
+
+    The import of sentence_transformers (and torch) happens here rather than at
+    module level, so importing this module stays cheap.
+
+    Returns:
+        SentenceTransformer: The loaded model.
+
+    Raises:
+        ValueError: If ``backend`` is not one of BACKENDS.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown encoder backend '{backend}', expected one of {', '.join(BACKENDS)}")
+
+    from sentence_transformers import SentenceTransformer
+
+    if threads:
+        import torch
+        torch.set_num_threads(threads)
+
+    if backend == "torch":
+        device = resolve_device(device)
+        model = SentenceTransformer(model_name, device=device)
+    elif backend == "onnx":
+        device = "cpu"
+        model_kwargs = {"provider": "CPUExecutionProvider"}
+        if threads:
+            import onnxruntime
+            session_options = onnxruntime.SessionOptions()
+            session_options.intra_op_num_threads = threads
+            model_kwargs["session_options"] = session_options
+        model = SentenceTransformer(model_name, device=device, backend="onnx", model_kwargs=model_kwargs)
+    else:
+        import torch
+        device = "cpu"
+        model = SentenceTransformer(model_name, device=device)
+        torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+    revision = model_revision(model, model_name)
+    model.model_key = f"{model_name}@{revision}:{backend}" if revision else f"{model_name}:{backend}"
+    logger.info(f"Loaded '{model_name}' ({revision or 'unknown revision'}) with the {backend} backend on {device} ({threads or os.cpu_count()} threads)")
+    return model
+
+
+def check_parity(model: object, reference: object, texts: list = PARITY_TEXTS) -> dict:
+    """
+    Compare the embeddings of a model with those of a reference model.
+
+    Args:
+        model (object): The model to check, for example an onnx or int8 encoder.
+        reference (object): The reference model, normally the torch backend.
+        texts (list, optional): Texts to encode. Defaults to PARITY_TEXTS.
+
+    Returns:
+        dict: The minimum and mean cosine similarity between the two embeddings of
+        each text, and whether the nearest neighbours among the texts are the same.
+    """
+    a = np.asarray(model.encode(texts, normalize_embeddings=True, show_progress_bar=False), dtype=np.float32)
+    b = np.asarray(reference.encode(texts, normalize_embeddings=True, show_progress_bar=False), dtype=np.float32)
+    cosine = (a * b).sum(axis=1)
+    return {
+        "min_cosine": float(cosine.min()),
+        "mean_cosine": float(cosine.mean()),
+        "same_ranking": bool((np.argsort(-(a @ a.T), axis=1) == np.argsort(-(b @ b.T), axis=1)).all()),
+    }
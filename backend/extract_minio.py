@@ -1,14 +1,15 @@
 import json
 from minio import Minio
-from minio.error import S3Error
 from io import BytesIO
 from PyPDF2 import PdfReader
 import re
 from config.logging_config.modern_log import LoggingConfig
-from config.config import BUCKET_NAME, DATA_DIR, FILE_EXTRACT
+from config.config import BUCKET_NAME, FILE_EXTRACT, FILE_EXTRACT_MANIFEST, FILE_DOCUMENTS, EXTRACT_FETCH_WORKERS, EXTRACT_PARSE_WORKERS, EXTRACT_MAX_IN_FLIGHT
+from backend.utils import faculty_of, document_id
 from tqdm import tqdm
-import subprocess
 import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 
 # ---------------------------------------------------------------------------- #
 #                                LOGGING CONFIG                                #
@@ -42,6 +43,92 @@ def clean_text(text: str) -> str:
         return " ".join(text.split()[1:]).strip().translate(mapping)
     return ""
 
+def extract_pages(pdf_bytes: bytes, metadata: dict) -> list:
+    """
+    Extracts the text of every page of a PDF.
+
+    This is a module-level function so it can run in a process pool.
+
+    Args:
+        pdf_bytes (bytes): The content of the PDF file.
+        metadata (dict): A dictionary of metadata about the PDF. Only its
+            ``doc_id`` and ``faculty`` are copied to the pages.
+
+    Returns:
+        list: A list of JSON objects, each containing the document id, faculty,
+        page number and the text content of that page.
+    """
+    reader = PdfReader(BytesIO(pdf_bytes))
+
+    content_per_page = []
+    for page_num, page in enumerate(reader.pages):
+        text = page.extract_text()
+        cleaned_text = clean_text(text)
+        if cleaned_text.strip() and "/uni0E" not in cleaned_text:
+            content_per_page.append({
+                "doc_id": metadata["doc_id"],
+                "faculty": metadata["faculty"],
+                "page": page_num + 1,
+                "content": cleaned_text,
+            })
+    logger.info(f"✅ Extracted text from: '{metadata['file_name']}'")
+    return content_per_page
+
+def _safe_extract_pages(pdf_bytes: bytes, metadata: dict) -> list:
+    # None (ไม่ใช่ list ว่าง) เพื่อให้ run แยก PDF ที่ parse ไม่ได้ออกจาก PDF ที่ไม่มีข้อความ
+    try:
+        return extract_pages(pdf_bytes, metadata)
+    except Exception as e:
+        logger.error(f"❌ Error parsing PDF '{metadata['location']}': {e}")
+        return None
+
+def object_version(obj: object) -> dict:
+    """
+    Version of a listed object, used to detect changes between runs.
+
+    Args:
+        obj (minio.datatypes.Object): An object from ``list_objects``.
+
+    Returns:
+        dict: The etag, size and ``x-amz-meta-modified_time`` of the object.
+    """
+    metadata = {key.lower(): value for key, value in (obj.metadata or {}).items()}
+    return {
+        "etag": obj.etag,
+        "size": obj.size,
+        "modified_time": metadata.get("x-amz-meta-modified_time"),
+    }
+
+class BucketStats:
+    def __init__(self):
+        """
+        Statistics of a bucket collected while streaming its listing.
+
+        Attributes:
+            count (int): Number of objects.
+            total_bytes (int): Total size of the objects in bytes.
+            faculties (dict): Faculty name to ``{"documents": int, "size": int}``,
+                in the order the faculties first appear in the listing.
+        """
+        self.count = 0
+        self.total_bytes = 0
+        self.faculties = {}
+
+    def add(self, obj: object) -> None:
+        size = obj.size or 0
+        self.count += 1
+        self.total_bytes += size
+        entry = self.faculties.setdefault(faculty_of(obj.object_name), {"documents": 0, "size": 0})
+        entry["documents"] += 1
+        entry["size"] += size
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "total_bytes": self.total_bytes,
+            "faculties": self.faculties,
+        }
+
 class MinioExtract:
     def __init__(self):
         """
@@ -55,139 +142,241 @@ class MinioExtract:
         :return: None
         """
         self.minio_client = Minio(
-            endpoint="localhost:9000",
-            access_key="minio",
-            secret_key="minio123",
+            endpoint=os.getenv('MINIO_ENDPOINT', 'localhost:9000').split("://")[-1],
+            access_key=os.getenv('MINIO_ROOT_USER', 'minio'),
+            secret_key=os.getenv('MINIO_ROOT_PASSWORD', 'minio123'),
             secure=False
         )
         self.bucket_name = BUCKET_NAME
 
-    def object_count_bucket(self) -> int:
+    def bucket_stats(self, objects: list = None) -> "BucketStats":
         """
-        Count the number of objects in the Minio bucket.
+        Collect statistics of the Minio bucket from a single listing.
 
-        This method uses the Minio client to execute a Docker command that
-        retrieves metadata about the specified bucket. It then extracts and
-        returns the count of objects in the bucket.
+        Args:
+            objects (list, optional): Objects already listed from the bucket. The
+                bucket is listed if not given, so callers that need the listing
+                anyway can share it.
 
         Returns:
-            int: The number of objects in the bucket if successful, otherwise logs an error.
-        """
-        alias_name = 'minio'
-        subprocess.run([
-            'docker', 'exec', 'minio', 'mc', 'alias', 'set', alias_name,
-            os.getenv('MINIO_ENDPOINT', 'http://localhost:9000'),
-            os.getenv('MINIO_ROOT_USER', 'minio'),
-            os.getenv('MINIO_ROOT_PASSWORD', 'minio123')
-        ], capture_output=True, text=True)
-        result = subprocess.run([
-            'docker', 'exec', 'minio', 'mc', 'stat', f'{alias_name}/document'
-        ], capture_output=True, text=True)
-
-        if result.returncode == 0:
-            match = re.search(r"Objects count:\s*(\d+)", result.stdout)
-            if match:
-                objects_count = match.group(1)
-                return int(objects_count)
-            else:
-                logger.error("Objects count not found.")
-        else:
-            logger.error(f"Error occurred: {result.stderr}")
-
-    def run(self) -> None:
+            BucketStats: Object count, total bytes and per-faculty breakdown.
+        """
+        if objects is None:
+            objects = self.minio_client.list_objects(self.bucket_name, recursive=True)
+        stats = BucketStats()
+        for obj in objects:
+            stats.add(obj)
+        return stats
+
+    def run(
+        self,
+        fetch_workers: int = EXTRACT_FETCH_WORKERS,
+        parse_workers: int = EXTRACT_PARSE_WORKERS,
+        max_in_flight: int = EXTRACT_MAX_IN_FLIGHT,
+        full: bool = False,
+    ) -> None:
         """
         Execute the extraction and processing of objects from the Minio bucket.
 
-        This method counts the number of objects in the bucket and retrieves
-        their metadata. It then processes each object, extracting text content
+        This method lists the bucket once, counting its objects from that
+        listing, and retrieves their metadata. It then processes each object, extracting text content
         from PDFs and writing the metadata and extracted content to a JSONL
         file.
 
-        The process includes:
-        - Counting objects in the specified Minio bucket.
-        - Listing objects along with their metadata.
-        - Extracting text from each PDF object.
-        - Saving metadata and extracted content to a file.
+        Only new or changed objects are downloaded and parsed. A manifest stores
+        the etag, size and modified time of every extracted object together with
+        the byte range of its pages in the JSONL file; unchanged objects reuse
+        those rows and rows of deleted objects are dropped. Objects that could
+        not be downloaded or parsed are left out of the manifest, so the next
+        run tries them again.
+
+        Pages only carry their document id, faculty, page number and content.
+        The metadata of each document (file name, author, dates, ...) is written
+        once to FILE_DOCUMENTS and joined to search results by ``DocumentStore``.
+
+        The work runs as a pipeline so network waits and parsing overlap:
+        - A thread pool downloads objects and their metadata from Minio.
+        - A process pool extracts the text of each PDF on all cores.
+        - The main thread writes the pages to the file in listing order.
 
         Utilizes the tqdm library to provide a progress bar for processing
         objects.
 
+        Args:
+            fetch_workers (int, optional): Threads downloading objects. Defaults to EXTRACT_FETCH_WORKERS.
+            parse_workers (int, optional): Processes parsing PDFs. Defaults to EXTRACT_PARSE_WORKERS.
+            max_in_flight (int, optional): Objects downloaded or parsed but not yet written. Defaults to EXTRACT_MAX_IN_FLIGHT.
+            full (bool, optional): Ignore the manifest and extract every object. Defaults to False.
+
         Logs:
             Information about the saving of results to a specific file path.
         """
 
-        object_count = self.object_count_bucket()
+        manifest = {} if full else self.load_manifest()
+        new_manifest = {}
+        reused = extracted = failed = 0
 
         logger.info(f"📂 Listing objects in bucket: '{self.bucket_name}'")
-        objects = self.minio_client.list_objects(self.bucket_name, recursive=True)
-
-        with open(FILE_EXTRACT, "w", encoding="utf-8") as f:
-            for obj in tqdm(objects, desc="Processing PDFs", unit="file", total=object_count, colour='green'):
-                stat = self.minio_client.stat_object(self.bucket_name, obj.object_name)
-                file_name = obj.object_name.split('/')[-1]
-                metadata = {
-                    "file_name": file_name,
-                    "author_name": stat.metadata.get('x-amz-meta-author_name', 'unknown'),
-                    "author_email": stat.metadata.get('x-amz-meta-author_email', 'unknown'),
-                    "author_profile": stat.metadata.get('x-amz-meta-author_profile', 'unknown'),
-                    "uploaded_date": stat.metadata.get('x-amz-meta-uploaded_date', 'unknown'),
-                    "created_date": stat.metadata.get('x-amz-meta-created_date', 'unknown'),
-                    "size": stat.size,
-                    "filetype": stat.content_type,
-                    "location": obj.object_name,
-                    "modified_by_name": stat.metadata.get('x-amz-meta-modified_by_name', 'unknown'),
-                    "modified_by_email": stat.metadata.get('x-amz-meta-modified_by_email', 'unknown'),
-                    "modified_profile": stat.metadata.get('x-amz-meta-modified_profile', 'unknown'),
-                    "modified_time": stat.metadata.get('x-amz-meta-modified_time', 'unknown')
-                }
-
-                content = self.extract_text_from_pdf_in_minio(self.bucket_name, obj.object_name, metadata)
-                if content:
-                    for item in content:
-                        json.dump(item, f, ensure_ascii=False)
-                        f.write("\n")
-
-        logger.info(f"✅ All results saved to '{DATA_DIR}/extracted_text_results.jsonl'")
+        listing = list(self.minio_client.list_objects(self.bucket_name, recursive=True, include_user_meta=True))
+        stats = self.bucket_stats(listing)
+        logger.info(f"📂 {stats.count} objects, {stats.total_bytes} bytes in {len(stats.faculties)} faculties")
+        objects = iter(listing)
 
-    # ---------------------------------------------------------------------------- #
-    #                                  Extraction                                  #
-    # ---------------------------------------------------------------------------- #
-    def extract_text_from_pdf_in_minio(self, bucket_name: str, object_name: str, metadata: dict) -> list:
+        tmp_path = f"{FILE_EXTRACT}.tmp"
+        old_file = open(FILE_EXTRACT, "rb") if manifest else None
+        try:
+            with ThreadPoolExecutor(max_workers=fetch_workers, thread_name_prefix="fetch") as fetch_pool, \
+                    ProcessPoolExecutor(max_workers=parse_workers) as parse_pool, \
+                    open(tmp_path, "wb") as f, \
+                    tqdm(desc="Processing PDFs", unit="file", total=stats.count, colour='green') as progress:
+                pending = deque()
+                while True:
+                    for obj in objects:
+                        version = object_version(obj)
+                        previous = manifest.get(obj.object_name)
+                        # manifest ที่ไม่มี document เป็นของ layout เก่าที่เก็บ metadata ทุกหน้า หรือของ object ที่เคย extract ไม่สำเร็จ ต้อง extract ใหม่
+                        if previous and previous.get("document") is not None and all(previous[key] == value for key, value in version.items()):
+                            pending.append((obj.object_name, version, previous, None))
+                        else:
+                            future = fetch_pool.submit(self._fetch_and_parse, obj.object_name, parse_pool)
+                            pending.append((obj.object_name, version, None, future))
+                        if len(pending) >= max_in_flight:
+                            break
+                    if not pending:
+                        break
+
+                    # เขียนผลลัพธ์ตามลำดับของ object ใน bucket
+                    object_name, version, previous, future = pending.popleft()
+                    offset = f.tell()
+                    if future is None:
+                        old_file.seek(previous["offset"])
+                        f.write(old_file.read(previous["length"]))
+                        pages = previous["pages"]
+                        document = previous["document"]
+                        reused += 1
+                    else:
+                        document, parse_future = future.result()
+                        content = parse_future.result() if parse_future else None
+                        if content is None:
+                            # ดาวน์โหลดหรือ parse ไม่สำเร็จ ไม่บันทึกใน manifest เพื่อให้รอบถัดไปลองใหม่
+                            failed += 1
+                            progress.update(1)
+                            continue
+                        for item in content:
+                            f.write(json.dumps(item, ensure_ascii=False).encode("utf-8"))
+                            f.write(b"\n")
+                        pages = len(content)
+                        extracted += 1
+                    new_manifest[object_name] = {**version, "offset": offset, "length": f.tell() - offset, "pages": pages, "document": document}
+                    progress.update(1)
+        finally:
+            if old_file:
+                old_file.close()
+
+        os.replace(tmp_path, FILE_EXTRACT)
+        self.save_documents(new_manifest)
+        self.save_manifest(new_manifest)
+        removed = len(set(manifest) - set(new_manifest))
+        logger.info(f"✅ All results saved to '{FILE_EXTRACT}' ({extracted} extracted, {reused} unchanged, {removed} removed, {failed} failed)")
+
+    def load_manifest(self) -> dict:
         """
-        Extracts text from a PDF stored in Minio.
+        Load the manifest of the previous run.
 
-        Given a Minio bucket name, object name, and metadata about the PDF, this
-        function extracts the text from the PDF and returns it. The text is
-        returned as a list of JSON objects, each containing the page number and
-        the text content of that page.
+        The manifest is only used if the JSONL file it describes still exists
+        with the size recorded in the manifest.
+
+        Returns:
+            dict: Object name to its version and byte range, or an empty dict.
+        """
+        try:
+            with open(FILE_EXTRACT_MANIFEST, encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest.get("extract_size") != os.path.getsize(FILE_EXTRACT):
+                logger.warning(f"'{FILE_EXTRACT}' does not match the manifest, extracting every object")
+                return {}
+            return manifest["objects"]
+        except (OSError, ValueError, KeyError):
+            return {}
+
+    def save_manifest(self, objects: dict) -> None:
+        manifest = {
+            "bucket": self.bucket_name,
+            "extract_size": os.path.getsize(FILE_EXTRACT),
+            "objects": objects,
+        }
+        tmp_path = f"{FILE_EXTRACT_MANIFEST}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.replace(tmp_path, FILE_EXTRACT_MANIFEST)
+
+    def save_documents(self, objects: dict) -> None:
+        """
+        Write the metadata of every extracted document to FILE_DOCUMENTS,
+        keyed by document id.
+
+        Args:
+            objects (dict): The new manifest entries.
+        """
+        documents = {
+            entry["document"]["doc_id"]: entry["document"]
+            for entry in objects.values()
+            if entry.get("document")
+        }
+        tmp_path = f"{FILE_DOCUMENTS}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(documents, f, ensure_ascii=False)
+        os.replace(tmp_path, FILE_DOCUMENTS)
+
+    def fetch_object(self, object_name: str) -> tuple:
+        """
+        Download an object and build the metadata of its pages.
 
         Args:
-            bucket_name (str): The name of the Minio bucket containing the PDF.
             object_name (str): The name of the object in the Minio bucket.
-            metadata (dict): A dictionary of metadata about the PDF.
 
         Returns:
-            list: A list of JSON objects, each containing the page number and
-            the text content of that page.
-
-        Logs:
-            Error message if an error occurs while extracting text from the PDF.
+            tuple: The metadata (dict) and the content (bytes) of the object.
         """
+        stat = self.minio_client.stat_object(self.bucket_name, object_name)
+        file_name = object_name.split('/')[-1]
+        metadata = {
+            "doc_id": document_id(object_name),
+            "file_name": file_name,
+            "author_name": stat.metadata.get('x-amz-meta-author_name', 'unknown'),
+            "author_email": stat.metadata.get('x-amz-meta-author_email', 'unknown'),
+            "author_profile": stat.metadata.get('x-amz-meta-author_profile', 'unknown'),
+            "uploaded_date": stat.metadata.get('x-amz-meta-uploaded_date', 'unknown'),
+            "created_date": stat.metadata.get('x-amz-meta-created_date', 'unknown'),
+            "size": stat.size,
+            "filetype": stat.content_type,
+            "location": object_name,
+            "faculty": faculty_of(object_name),
+            "modified_by_name": stat.metadata.get('x-amz-meta-modified_by_name', 'unknown'),
+            "modified_by_email": stat.metadata.get('x-amz-meta-modified_by_email', 'unknown'),
+            "modified_profile": stat.metadata.get('x-amz-meta-modified_profile', 'unknown'),
+            "modified_time": stat.metadata.get('x-amz-meta-modified_time', 'unknown')
+        }
+
+        response = self.minio_client.get_object(self.bucket_name, object_name)
         try:
-            response = self.minio_client.get_object(bucket_name, object_name)
-            pdf_stream = BytesIO(response.read())
+            data = response.read()
+        finally:
             response.close()
             response.release_conn()
+        return metadata, data
 
-            content_per_page = self.extract_pdf(
-                pdf_stream=pdf_stream,
-                metadata=metadata
-            )
-            return content_per_page
+    def _fetch_and_parse(self, object_name: str, parse_pool: ProcessPoolExecutor) -> tuple:
+        try:
+            metadata, data = self.fetch_object(object_name)
         except Exception as e:
             logger.error(f"❌ Error reading PDF from MinIO: {e}")
-            return []
+            return None, None
+        return metadata, parse_pool.submit(_safe_extract_pages, data, metadata)
 
+    # ---------------------------------------------------------------------------- #
+    #                                  Extraction                                  #
+    # ---------------------------------------------------------------------------- #
     def extract_pdf(self, pdf_stream: BytesIO, metadata: dict) -> list:
         """
         Extracts text from a PDF stored in a BytesIO object.
@@ -199,39 +388,26 @@ class MinioExtract:
 
         Args:
             pdf_stream (BytesIO): A BytesIO object containing a PDF.
-            metadata (dict): A dictionary of metadata about the PDF.
+            metadata (dict): Metadata of the PDF as built by ``fetch_object``; it must
+                contain ``doc_id``, ``faculty`` and ``file_name``.
 
         Returns:
-            list: A list of JSON objects, each containing the page number and
-            the text content of that page.
+            list: A list of JSON objects, each containing the document id, faculty,
+            page number and the text content of that page.
 
         Logs:
             A success message if the text is extracted successfully.
         """
-        reader = PdfReader(pdf_stream)
-
-        content_per_page = []
-        for page_num, page in enumerate(reader.pages):
-            text = page.extract_text()
-            cleaned_text = clean_text(text)
-            if cleaned_text.strip() and "/uni0E" not in cleaned_text:
-                content_per_page.append({
-                    **metadata,
-                    "content": cleaned_text,
-                    "page": page_num + 1,
-                })
-        logger.info(f"✅ Extracted text from: '{metadata['file_name']}'")
-        return content_per_page
+        return extract_pages(pdf_stream.getvalue(), metadata)
 
     def list_objects(self) -> list:
-        objects = self.minio_client.list_objects(self.bucket_name, recursive=True)
-        locations = []
-        for obj in objects:
-            location = obj.object_name
-            location = location.split("/")[1]
-            if location not in locations:
-                locations.append(location)
-        return locations
+        """
+        List the faculties in the bucket, in the order they first appear.
+
+        Returns:
+            list: Unique faculty names.
+        """
+        return list(self.bucket_stats().faculties)
     
 if __name__ == "__main__":
     minio_embed = MinioExtract()
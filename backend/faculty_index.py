@@ -0,0 +1,109 @@
+import json
+import time
+import hashlib
+import threading
+
+from config.config import FACULTY_REFRESH_INTERVAL
+from config.logging_config.modern_log import LoggingConfig
+
+# ---------------------------------------------------------------------------- #
+#                                LOGGING CONFIG                                #
+# ---------------------------------------------------------------------------- #
+logger = LoggingConfig(level="INFO").get_logger("faculty_index")
+# ---------------------------------------------------------------------------- #
+
+
+class FacultyIndex:
+    def __init__(self, extractor: object, refresh_interval: float = FACULTY_REFRESH_INTERVAL):
+        """
+        In-memory list of faculties with per-faculty document counts.
+
+        The list is built from one listing of the bucket and then served from
+        memory. A background thread rebuilds it every ``refresh_interval``
+        seconds, and ``refresh`` can be called after an ingest.
+
+        Args:
+            extractor (MinioExtract): Client of the document bucket.
+            refresh_interval (float, optional): Seconds between background refreshes. Defaults to FACULTY_REFRESH_INTERVAL.
+        """
+        self.extractor = extractor
+        self.refresh_interval = refresh_interval
+        self._snapshot = None
+        self.refreshed_at = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def refresh(self, min_age: float = 0) -> dict:
+        """
+        Rebuild the index from the bucket. On failure the previous index is kept.
+
+        Args:
+            min_age (float, optional): Keep the current index if it was rebuilt less
+                than this many seconds ago. Defaults to 0.
+
+        Returns:
+            dict: The current snapshot.
+        """
+        with self._lock:
+            if self._snapshot is not None and self.age() < min_age:
+                return self._snapshot
+            try:
+                stats = self.extractor.bucket_stats()
+            except Exception as e:
+                logger.error(f"❌ Error listing faculties: {e}")
+                if self._snapshot is None:
+                    raise
+                return self._snapshot
+            body = json.dumps(stats.as_dict(), ensure_ascii=False, sort_keys=True).encode("utf-8")
+            self._snapshot = {
+                "faculties": list(stats.faculties),
+                "counts": stats.faculties,
+                "bucket": {"count": stats.count, "total_bytes": stats.total_bytes},
+                "etag": f'"{hashlib.sha1(body).hexdigest()}"',
+            }
+            self.refreshed_at = time.monotonic()
+            logger.info(f"Faculty index refreshed with {len(stats.faculties)} faculties")
+            return self._snapshot
+
+    def age(self) -> float:
+        """
+        Returns:
+            float: Seconds since the index was last rebuilt, infinite if it never was.
+        """
+        refreshed_at = self.refreshed_at
+        return float("inf") if refreshed_at is None else time.monotonic() - refreshed_at
+
+    def snapshot(self) -> dict:
+        """
+        Returns:
+            dict: ``faculties`` (list), ``counts`` (dict), ``bucket`` totals (dict)
+            and ``etag`` (str) of the index. The index is built on the first call if it does not exist yet.
+        """
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._lock:
+                snapshot = self._snapshot
+            if snapshot is None:
+                snapshot = self.refresh()
+        return snapshot
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+            except Exception:
+                pass
+            self._stop.wait(self.refresh_interval)
+
+    def start(self) -> None:
+        """Start refreshing the index in a background thread."""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="faculty-index", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background refresh."""
+        self._stop.set()
+        self._thread = None
@@ -0,0 +1,200 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.metrics import stage
+from backend.utils import normalize_faculty
+from config.config import HYBRID_RRF_K, HYBRID_WEIGHT, HYBRID_DEPTH
+
+
+def reciprocal_rank_fusion(
+    dense: list,
+    lexical: list,
+    location: list = None,
+    top: int = 5,
+    weight: float = HYBRID_WEIGHT,
+    k: int = HYBRID_RRF_K,
+    dedupe: bool = True,
+) -> list:
+    """
+    Fuse two ranked result lists with weighted reciprocal rank fusion.
+
+    A result at rank ``r`` (starting at 1) of the dense list contributes
+    ``weight / (k + r)`` and a result of the lexical list contributes
+    ``(1 - weight) / (k + r)``. When locations are given, ranks are counted per
+    location and the top results are returned per location, in the given order.
+    With ``dedupe``, only the first (best) hit of a page in each list is ranked,
+    so a page split into several chunks is counted once per list.
+
+    Args:
+        dense (list): Results of the neural searcher.
+        lexical (list): Results of the text searcher.
+        location (list, optional): Locations the results were searched in.
+        top (int, optional): The number of results to return per location. Defaults to 5.
+        weight (float, optional): Weight of the dense results, between 0 and 1. Defaults to HYBRID_WEIGHT.
+        k (int, optional): Rank constant of the fusion. Defaults to HYBRID_RRF_K.
+        dedupe (bool, optional): Merge results that point to the same page (same
+            ``doc_id`` and ``page``). Defaults to True.
+
+    Returns:
+        list: Fused results, each with its fused ``score``.
+    """
+    fused = {}
+    for results, source_weight in ((dense, weight), (lexical, 1 - weight)):
+        ranks = {}
+        seen = set()
+        for hit in results:
+            payload = hit["payload"]
+            group = payload.get("faculty") if location else None
+            key = (payload.get("doc_id"), payload.get("page"))
+            if dedupe and key in seen:
+                continue
+            seen.add(key)
+            ranks[group] = ranks.get(group, 0) + 1
+            if not dedupe:
+                key = (id(results), ranks[group], group)
+            entry = fused.setdefault(key, {"payload": payload, "score": 0.0, "group": group})
+            entry["score"] += source_weight / (k + ranks[group])
+
+    ranked = sorted(fused.values(), key=lambda entry: entry["score"], reverse=True)
+    if not location:
+        return [{"payload": entry["payload"], "score": entry["score"]} for entry in ranked[:top]]
+
+    results = []
+    for loc in location:
+        loc = normalize_faculty(loc)
+        group = [entry for entry in ranked if entry["group"] == loc][:top]
+        results.extend({"payload": entry["payload"], "score": entry["score"]} for entry in group)
+    return results
+
+
+class HybridSearcher:
+    def __init__(self, neural_searcher: object, text_searcher: object, max_workers: int = 8):
+        """
+        Args:
+            neural_searcher (NeuralSearcher): The dense retriever.
+            text_searcher (TextSearcher): The lexical retriever.
+            max_workers (int, optional): Threads used to run the two retrievers in parallel. Defaults to 8.
+        """
+        self.neural_searcher = neural_searcher
+        self.text_searcher = text_searcher
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hybrid")
+
+    def search(
+        self,
+        query: str,
+        location: list = None,
+        top: int = 5,
+        weight: float = HYBRID_WEIGHT,
+        depth: int = HYBRID_DEPTH,
+        dedupe: bool = True,
+    ) -> list:
+        """
+        Search with both retrievers in parallel and fuse their results.
+
+        Args:
+            query (str): The text to search for.
+            location (list, optional): List of location strings for filtering.
+            top (int, optional): The number of results to return per location. Defaults to 5.
+            weight (float, optional): Weight of the dense results, between 0 and 1. Defaults to HYBRID_WEIGHT.
+            depth (int, optional): Candidates fetched from each retriever (per location). Defaults to HYBRID_DEPTH.
+            dedupe (bool, optional): Merge results that point to the same page. Defaults to True.
+
+        Returns:
+            list: Fused results with their fused scores.
+        """
+        depth = max(depth, top)
+        dense = self.executor.submit(self.neural_searcher.search, query=query, location=location, top=depth)
+        lexical = self.executor.submit(self.text_searcher.search, query=query, location=location, top=depth)
+        dense, lexical = dense.result(), lexical.result()
+        with stage("fuse"):
+            return reciprocal_rank_fusion(
+                dense,
+                lexical,
+                location=location,
+                top=top,
+                weight=weight,
+                dedupe=dedupe,
+            )
+
+    async def asearch(
+        self,
+        query: str,
+        location: list = None,
+        top: int = 5,
+        weight: float = HYBRID_WEIGHT,
+        depth: int = HYBRID_DEPTH,
+        dedupe: bool = True,
+    ) -> list:
+        """
+        Non-blocking version of ``search``; both retrievers are awaited concurrently.
+        """
+        depth = max(depth, top)
+        dense, lexical = await asyncio.gather(
+            self.neural_searcher.asearch(query=query, location=location, top=depth),
+            self.text_searcher.asearch(query=query, location=location, top=depth),
+        )
+        with stage("fuse"):
+            return reciprocal_rank_fusion(
+                dense,
+                lexical,
+                location=location,
+                top=top,
+                weight=weight,
+                dedupe=dedupe,
+            )
+
+    async def astream(
+        self,
+        query: str,
+        location: list = None,
+        top: int = 5,
+        weight: float = HYBRID_WEIGHT,
+        depth: int = HYBRID_DEPTH,
+        dedupe: bool = True,
+    ):
+        """
+        Same as ``asearch``, but yields the fused hits of each location as soon as
+        both retrievers have returned that location.
+
+        Yields:
+            tuple: ``(location, hits)`` in the order the locations complete; ``location``
+            is None for a search without locations.
+        """
+        depth = max(depth, top)
+        queue = asyncio.Queue()
+
+        async def drain(source, stream):
+            try:
+                async for loc, hits in stream:
+                    queue.put_nowait((source, loc, hits))
+            except Exception as e:
+                queue.put_nowait((None, None, e))
+
+        tasks = [
+            asyncio.create_task(drain("dense", self.neural_searcher.astream(query=query, location=location, top=depth))),
+            asyncio.create_task(drain("lexical", self.text_searcher.astream(query=query, location=location, top=depth))),
+        ]
+        partial = {}
+        try:
+            for _ in range(2 * len(location or [None])):
+                source, loc, hits = await queue.get()
+                if source is None:
+                    raise hits
+                other = partial.pop(loc, None)
+                if other is None:
+                    partial[loc] = (source, hits)
+                    continue
+                dense, lexical = (hits, other[1]) if source == "dense" else (other[1], hits)
+                with stage("fuse"):
+                    fused = reciprocal_rank_fusion(
+                        dense,
+                        lexical,
+                        location=[loc] if loc is not None else None,
+                        top=top,
+                        weight=weight,
+                        dedupe=dedupe,
+                    )
+                yield loc, fused
+        finally:
+            for task in tasks:
+                task.cancel()
@@ -0,0 +1,286 @@
+import os
+import re
+import json
+import mmap
+import shutil
+from math import log
+from collections import Counter, defaultdict
+
+import numpy as np
+from tqdm import tqdm
+
+from backend.utils import normalize_faculty
+from backend.result_cache import bump_generation
+from config.config import FILE_EXTRACT, FILE_INDEX_GENERATION, LEXICAL_INDEX_DIR, BM25_K1, BM25_B
+from config.logging_config.modern_log import LoggingConfig
+
+# ---------------------------------------------------------------------------- #
+#                                LOGGING CONFIG                                #
+# ---------------------------------------------------------------------------- #
+logger = LoggingConfig(level="INFO").get_logger("lexical_index")
+# ---------------------------------------------------------------------------- #
+
+TOKENIZER = "thai-cluster-bigram-v1"
+MAX_TERM_BYTES = 48
+PAGES_FILE = "pages.jsonl"
+
+_RUN_PATTERN = re.compile(r"[\u0E00-\u0E7F]+|[^\W_\u0E00-\u0E7F]+")
+_THAI_CLUSTER = re.compile(r"[\u0E00-\u0E30\u0E32\u0E33\u0E3B-\u0E46\u0E4F-\u0E7F][\u0E31\u0E34-\u0E3A\u0E47-\u0E4E]*|[\u0E31\u0E34-\u0E3A\u0E47-\u0E4E]+")
+
+
+def tokenize(text: str) -> list:
+    """
+    Split text into index terms.
+
+    Thai is written without spaces between words, so Thai runs are split into
+    character clusters (a base character with its vowel and tone marks) and
+    indexed as overlapping cluster bigrams. A run with a single cluster is kept
+    as a unigram. Latin words and numbers are lower-cased and kept whole.
+
+    Args:
+        text (str): Text to tokenize.
+
+    Returns:
+        list: The terms of the text, in order.
+    """
+    terms = []
+    for run in _RUN_PATTERN.findall(text.lower()):
+        if "\u0e00" <= run[0] <= "\u0e7f":
+            clusters = _THAI_CLUSTER.findall(run)
+            if len(clusters) == 1:
+                terms.append(clusters[0])
+            else:
+                terms.extend(a + b for a, b in zip(clusters, clusters[1:]))
+        else:
+            terms.append(run)
+    return terms
+
+
+def _encode_term(term: str) -> bytes:
+    return term.encode("utf-8")[:MAX_TERM_BYTES]
+
+
+class LexicalIndex:
+    def __init__(self, index_dir: str = LEXICAL_INDEX_DIR):
+        """
+        Load a BM25 index written by ``LexicalIndex.build``.
+
+        The arrays of the index are memory-mapped, so loading is independent of
+        the index size and pages are only read from disk when a query touches them.
+        Documents are read back from the copy of the extracted pages stored in
+        the index directory (``PAGES_FILE``), using the byte offsets stored in
+        the index, so replacing the JSON lines file does not affect a built index.
+
+        Args:
+            index_dir (str, optional): Directory of the index. Defaults to LEXICAL_INDEX_DIR.
+
+        Raises:
+            FileNotFoundError: If no index exists in ``index_dir``.
+            ValueError: If the index was built with another tokenizer, or is an
+                older index without ``PAGES_FILE`` whose source file has changed.
+        """
+        meta_path = os.path.join(index_dir, "meta.json")
+        if not os.path.exists(meta_path):
+            raise FileNotFoundError(f"Lexical index not found in '{index_dir}', build it with 'python backend/lexical_index.py'")
+
+        with open(meta_path, encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta["tokenizer"] != TOKENIZER:
+            raise ValueError(f"Lexical index was built with tokenizer '{self.meta['tokenizer']}', expected '{TOKENIZER}'")
+
+        def load(name):
+            return np.load(os.path.join(index_dir, f"{name}.npy"), mmap_mode="r")
+
+        self.terms = load("terms")
+        self.term_offsets = load("term_offsets")
+        self.postings_docs = load("postings_docs")
+        self.postings_tf = load("postings_tf")
+        self.doc_len = load("doc_len")
+        self.doc_offsets = load("doc_offsets")
+        self.doc_faculty = load("doc_faculty")
+        self.faculties = {name: i for i, name in enumerate(self.meta["faculties"])}
+        self.num_docs = self.meta["num_docs"]
+        self.avgdl = self.meta["avgdl"]
+        self.k1 = self.meta["k1"]
+        self.b = self.meta["b"]
+
+        source = os.path.join(index_dir, PAGES_FILE)
+        if not os.path.exists(source):
+            # index ที่สร้างก่อนมี PAGES_FILE อ่านจากไฟล์ต้นทาง ซึ่งใช้ได้เฉพาะเมื่อไฟล์ยังไม่เปลี่ยน
+            source = self.meta["source"]
+        stat = os.stat(source)
+        if stat.st_size != self.meta["source_size"]:
+            logger.error(f"❌ '{source}' changed since the lexical index was built, rebuild the index")
+            raise ValueError(f"Lexical index in '{index_dir}' does not match '{source}', rebuild it with 'python backend/lexical_index.py'")
+        with open(source, "rb") as f:
+            self._source = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if stat.st_size else b""
+
+    def _postings(self, term: str):
+        key = _encode_term(term)
+        i = int(np.searchsorted(self.terms, key))
+        if i >= len(self.terms) or self.terms[i] != key:
+            return None
+        start, end = self.term_offsets[i], self.term_offsets[i + 1]
+        return self.postings_docs[start:end], self.postings_tf[start:end]
+
+    def scores(self, query: str) -> np.ndarray:
+        """
+        Compute the BM25 score of every document for a query.
+
+        Args:
+            query (str): The text to search for.
+
+        Returns:
+            numpy.ndarray: One score per document; documents without a query term score 0.
+        """
+        scores = np.zeros(self.num_docs, dtype=np.float32)
+        for term, qtf in Counter(tokenize(query)).items():
+            postings = self._postings(term)
+            if postings is None:
+                continue
+            docs, tf = postings
+            df = len(docs)
+            idf = log(1 + (self.num_docs - df + 0.5) / (df + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * self.doc_len[docs] / self.avgdl)
+            scores[docs] += qtf * idf * tf * (self.k1 + 1) / (tf + norm)
+        return scores
+
+    @staticmethod
+    def _top(candidates: np.ndarray, scores: np.ndarray, top: int) -> list:
+        if len(candidates) > top:
+            candidates = candidates[np.argpartition(-scores[candidates], top - 1)[:top]]
+        order = np.argsort(-scores[candidates], kind="stable")
+        return [(int(doc), float(scores[doc])) for doc in candidates[order]]
+
+    def search(self, query: str, location: list = None, top: int = 5, scores: np.ndarray = None) -> list:
+        """
+        Rank documents for a query with BM25.
+
+        Args:
+            query (str): The text to search for.
+            location (list, optional): Faculties to search in. The top results are
+                returned per faculty, in the given order.
+            top (int, optional): The number of results to return (per faculty). Defaults to 5.
+            scores (np.ndarray, optional): ``scores(query)`` computed earlier, so the
+                results of several faculties can be taken one at a time without
+                scoring the query again.
+
+        Returns:
+            list: ``(doc, score)`` tuples, best first.
+        """
+        if top <= 0:
+            return []
+        if scores is None:
+            scores = self.scores(query)
+        candidates = np.flatnonzero(scores)
+        if not location:
+            return self._top(candidates, scores, top)
+
+        results = []
+        candidate_faculty = self.doc_faculty[candidates]
+        for loc in location:
+            faculty = self.faculties.get(normalize_faculty(loc))
+            if faculty is None:
+                continue
+            results.extend(self._top(candidates[candidate_faculty == faculty], scores, top))
+        return results
+
+    def document(self, doc: int) -> dict:
+        """
+        Read a document back from the copy of the pages stored with the index.
+
+        Args:
+            doc (int): Document number returned by ``search``.
+
+        Returns:
+            dict: The parsed JSON line.
+        """
+        start, end = self.doc_offsets[doc], self.doc_offsets[doc + 1]
+        return json.loads(self._source[start:end])
+
+    @classmethod
+    def build(cls, json_path: str = FILE_EXTRACT, index_dir: str = LEXICAL_INDEX_DIR, k1: float = BM25_K1, b: float = BM25_B, generation_path: str = FILE_INDEX_GENERATION) -> None:
+        """
+        Build a BM25 index from a JSON lines file of extracted pages.
+
+        The index is written to a temporary directory and moved into place when
+        complete, so a running service never reads a half-written index. The
+        pages are copied into the index (``PAGES_FILE``), so the index stays
+        consistent when ``json_path`` is replaced by a new extraction.
+
+        Args:
+            json_path (str, optional): Path of the extracted pages. Defaults to FILE_EXTRACT.
+            index_dir (str, optional): Directory to write the index to. Defaults to LEXICAL_INDEX_DIR.
+            k1 (float, optional): BM25 term frequency saturation. Defaults to BM25_K1.
+            b (float, optional): BM25 length normalization. Defaults to BM25_B.
+            generation_path (str, optional): Index generation bumped when the index is in place.
+                Defaults to FILE_INDEX_GENERATION.
+        """
+        postings = defaultdict(list)
+        doc_len, doc_faculty, doc_offsets = [], [], [0]
+        faculties = {}
+
+        tmp_dir = f"{index_dir}.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+
+        with open(json_path, "rb") as f, open(os.path.join(tmp_dir, PAGES_FILE), "wb") as pages:
+            for line in tqdm(f, desc="Indexing pages", unit="page", colour="green"):
+                pages.write(line)
+                doc_offsets.append(doc_offsets[-1] + len(line))
+                item = json.loads(line)
+                terms = Counter(_encode_term(term) for term in tokenize(item.get("content", "")))
+                doc = len(doc_len)
+                for term, tf in terms.items():
+                    postings[term].append((doc, tf))
+                doc_len.append(sum(terms.values()))
+                faculty = item["faculty"]
+                doc_faculty.append(faculties.setdefault(faculty, len(faculties)))
+
+        terms = sorted(postings)
+        term_offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        term_offsets[1:] = np.cumsum([len(postings[term]) for term in terms])
+        postings_docs = np.empty(term_offsets[-1], dtype=np.int32)
+        postings_tf = np.empty(term_offsets[-1], dtype=np.float32)
+        for i, term in enumerate(terms):
+            docs, tfs = zip(*postings[term])
+            postings_docs[term_offsets[i]:term_offsets[i + 1]] = docs
+            postings_tf[term_offsets[i]:term_offsets[i + 1]] = tfs
+
+        arrays = {
+            "terms": np.array(terms, dtype=f"S{MAX_TERM_BYTES}"),
+            "term_offsets": term_offsets,
+            "postings_docs": postings_docs,
+            "postings_tf": postings_tf,
+            "doc_len": np.array(doc_len, dtype=np.float32),
+            "doc_offsets": np.array(doc_offsets, dtype=np.int64),
+            "doc_faculty": np.array(doc_faculty, dtype=np.int32),
+        }
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), array)
+        meta = {
+            "tokenizer": TOKENIZER,
+            "num_docs": len(doc_len),
+            "avgdl": (sum(doc_len) / len(doc_len)) if doc_len else 1.0,
+            "k1": k1,
+            "b": b,
+            "faculties": list(faculties),
+            "source": os.path.abspath(json_path),
+            "source_size": doc_offsets[-1],
+        }
+        with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+
+        old_dir = f"{index_dir}.old"
+        shutil.rmtree(old_dir, ignore_errors=True)
+        if os.path.exists(index_dir):
+            os.rename(index_dir, old_dir)
+        os.rename(tmp_dir, index_dir)
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+        bump_generation(generation_path)
+        logger.info(f"✅ Indexed {len(doc_len)} pages and {len(terms)} terms to '{index_dir}'")
+
+
+if __name__ == "__main__":
+    LexicalIndex.build()
@@ -0,0 +1,203 @@
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from urllib.parse import parse_qs
+
+# ระยะเวลาเป็นวินาที ครอบคลุมตั้งแต่ normalize (ไมโครวินาที) จนถึง encode บน CPU (หลายวินาที)
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_timings = ContextVar("timings", default=None)
+
+
+def _escape(value: object) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labelnames: tuple, values: tuple, extra: dict = None) -> str:
+    pairs = list(zip(labelnames, values)) + list((extra or {}).items())
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        """
+        Monotonic counter in the Prometheus text format.
+
+        Args:
+            name (str): Metric name, ending in ``_total``.
+            documentation (str): HELP text.
+            labelnames (tuple, optional): Label names; values are passed to ``inc`` in the same order.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def collect(self) -> list:
+        with self._lock:
+            values = dict(self._values)
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        lines.extend(f"{self.name}{_format_labels(self.labelnames, labels)} {value}" for labels, value in values.items())
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        """
+        Histogram with fixed buckets in the Prometheus text format.
+
+        ``observe`` is a bisect and three additions under a lock, cheap enough
+        for every request.
+
+        Args:
+            name (str): Metric name.
+            documentation (str): HELP text.
+            labelnames (tuple, optional): Label names; values are passed to ``observe`` in the same order.
+            buckets (tuple, optional): Upper bounds of the buckets, ascending. Defaults to LATENCY_BUCKETS.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def collect(self) -> list:
+        with self._lock:
+            series = {labels: (list(counts), total, count) for labels, (counts, total, count) in self._series.items()}
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, count) in series.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, {'le': le})} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        """
+        Metrics exported on ``/metrics``.
+
+        Besides counters and histograms, callbacks can export values that other
+        components already count (for example cache statistics) when scraped.
+        A callback returns ``(name, type, documentation, value)`` tuples.
+        """
+        self._metrics = []
+        self._callbacks = {}
+
+    def register(self, metric: object) -> object:
+        self._metrics.append(metric)
+        return metric
+
+    def register_callback(self, key: str, callback) -> None:
+        """Add a callback, replacing the one registered under the same key."""
+        self._callbacks[key] = callback
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.collect())
+        for callback in list(self._callbacks.values()):
+            for name, kind, documentation, value in callback():
+                lines.extend([f"# HELP {name} {documentation}", f"# TYPE {name} {kind}", f"{name} {value}"])
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram("search_stage_seconds", "Time spent in each stage of a search.", ("stage",)))
+REQUEST_SECONDS = REGISTRY.register(Histogram("http_request_duration_seconds", "Time to the end of the response, per handler.", ("handler",)))
+REQUESTS = REGISTRY.register(Counter("http_requests_total", "HTTP responses, per handler and status code.", ("handler", "status")))
+SEARCHES = REGISTRY.register(Counter("search_requests_total", "Searches, per mode.", ("mode",)))
+SEARCH_RESULTS = REGISTRY.register(Counter("search_results_total", "Results returned, per mode.", ("mode",)))
+EMPTY_SEARCHES = REGISTRY.register(Counter("search_empty_total", "Searches that returned no result, per mode.", ("mode",)))
+SEARCH_ERRORS = REGISTRY.register(Counter("search_errors_total", "Searches that failed, per mode and exception type.", ("mode", "error")))
+
+
+@contextmanager
+def stage(name: str):
+    """
+    Time the block as a search stage.
+
+    The duration is observed in ``search_stage_seconds`` and, inside a request
+    tracked by ``MetricsMiddleware``, added to that request's Server-Timing.
+    Works around ``await`` as well, since the time is taken on entry and exit.
+
+    Args:
+        name (str): Name of the stage.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, name)
+        timings = _timings.get()
+        if timings is not None:
+            timings[name] = timings.get(name, 0.0) + elapsed
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        """
+        ASGI middleware that counts responses and times requests per handler.
+
+        Requests with the ``timing=true`` query parameter get a ``Server-Timing``
+        header with the duration of every ``stage`` of the request.
+
+        Args:
+            app: The ASGI application to wrap.
+        """
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        timings = {}
+        token = _timings.set(timings)
+        wants_timing = b"timing=" in scope.get("query_string", b"") and \
+            parse_qs(scope["query_string"].decode("latin-1")).get("timing", [""])[-1].lower() in ("1", "true")
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if wants_timing:
+                    timings["total"] = time.perf_counter() - started
+                    header = ", ".join(f"{name};dur={seconds * 1000:.2f}" for name, seconds in timings.items())
+                    message = {**message, "headers": [*message.get("headers", []), (b"server-timing", header.encode("latin-1"))]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _timings.reset(token)
+            endpoint = scope.get("endpoint")
+            handler = getattr(endpoint, "__name__", "unmatched")
+            REQUEST_SECONDS.observe(time.perf_counter() - started, handler)
+            REQUESTS.inc(handler, str(status))
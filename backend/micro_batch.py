@@ -0,0 +1,117 @@
+import time
+import asyncio
+from collections import deque
+
+import numpy as np
+
+from backend.concurrency import BoundedExecutor
+from backend.metrics import STAGE_SECONDS
+from config.config import ENCODE_MAX_BATCH, ENCODE_BATCH_WINDOW_MS
+
+
+class MicroBatchEncoder:
+    def __init__(
+        self,
+        model: object,
+        executor: BoundedExecutor,
+        max_batch: int = ENCODE_MAX_BATCH,
+        window_ms: float = ENCODE_BATCH_WINDOW_MS,
+    ):
+        """
+        Group concurrent single-query encodes into one forward pass of the model.
+
+        The first query that arrives opens a batch. The batch is encoded when
+        ``window_ms`` milliseconds have passed or ``max_batch`` queries have
+        joined it, whichever comes first, and every caller gets its own vector.
+
+        Args:
+            model (object): A sentence transformer model to convert text to vectors.
+            executor (BoundedExecutor): Threads that run the model.
+            max_batch (int, optional): Maximum queries per forward pass. Defaults to ENCODE_MAX_BATCH.
+            window_ms (float, optional): How long a batch waits for more queries. Defaults to ENCODE_BATCH_WINDOW_MS.
+        """
+        self.model = model
+        self.executor = executor
+        self.max_batch = max_batch
+        self.window = window_ms / 1000
+        self._queue = []
+        self._timer = None
+        self._tasks = set()
+        self.batches = 0
+        self.encoded = 0
+        self.batch_sizes = {}
+        self._delays = deque(maxlen=4096)
+
+    async def encode(self, text: str) -> np.ndarray:
+        """
+        Encode one query as part of the next batch.
+
+        Args:
+            text (str): The text to encode.
+
+        Returns:
+            numpy.ndarray: The vector of the text.
+
+        Raises:
+            QueueFullError: If the executor already has too many pending batches.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._queue.append((text, future, time.perf_counter()))
+        if len(self._queue) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._queue:
+            batch, self._queue = self._queue[:self.max_batch], self._queue[self.max_batch:]
+            task = asyncio.ensure_future(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: list) -> None:
+        started = time.perf_counter()
+        for _, _, enqueued in batch:
+            self._delays.append(started - enqueued)
+        texts = list(dict.fromkeys(text for text, _, _ in batch))
+        self.batches += 1
+        self.encoded += len(texts)
+        self.batch_sizes[len(texts)] = self.batch_sizes.get(len(texts), 0) + 1
+        try:
+            vectors = await self.executor.run(self.model.encode, texts, show_progress_bar=False)
+            # batch ใช้ร่วมกันหลาย request จึงไม่นับเข้า Server-Timing ของ request ใด request หนึ่ง
+            STAGE_SECONDS.observe(time.perf_counter() - started, "encode_batch")
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        by_text = dict(zip(texts, vectors))
+        for text, future, _ in batch:
+            if not future.done():
+                future.set_result(by_text[text])
+
+    def stats(self) -> dict:
+        """
+        Returns:
+            dict: Batch counts, the distribution of batch sizes and queueing delay percentiles in milliseconds.
+        """
+        delays = np.array(self._delays) * 1000 if self._delays else np.zeros(1)
+        return {
+            "batches": self.batches,
+            "encoded": self.encoded,
+            "mean_batch_size": self.encoded / self.batches if self.batches else 0.0,
+            "batch_sizes": dict(sorted(self.batch_sizes.items())),
+            "queue_delay_ms": {
+                "p50": float(np.percentile(delays, 50)),
+                "p99": float(np.percentile(delays, 99)),
+                "max": float(delays.max()),
+            },
+            "window_ms": self.window * 1000,
+            "max_batch": self.max_batch,
+        }
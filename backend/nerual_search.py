@@ -1,79 +1,235 @@
-from qdrant_client import QdrantClient
-from sentence_transformers import SentenceTransformer
-from qdrant_client.models import Filter, FieldCondition, MatchText
+import asyncio
 
-from config.config import COLLECTION_NAME
+from qdrant_client import QdrantClient, AsyncQdrantClient
+from qdrant_client.models import Filter, FieldCondition, MatchValue, QueryRequest, SearchParams, QuantizationSearchParams
+
+from config.config import (
+    COLLECTION_NAME, QDRANT_HOST, ENCODE_WORKERS, ENCODE_MAX_PENDING,
+    SEARCH_HNSW_EF, SEARCH_OVERSAMPLING, SEARCH_RESCORE, SEARCH_PAYLOAD_FIELDS, SEARCH_CHUNK_OVERFETCH,
+)
+from backend.concurrency import BoundedExecutor
+from backend.embedding_cache import QueryEmbeddingCache
+from backend.micro_batch import MicroBatchEncoder
+from backend.metrics import stage
+from backend.utils import normalize_query, normalize_faculty, model_identity
 
 class NeuralSearcher:
-    def __init__(self, collection_name: str, model: object, qdrant_host: str = "http://localhost:6333"):   
+    def __init__(self, collection_name: str, model: object, qdrant_host: str = QDRANT_HOST, qdrant_client: QdrantClient = None, async_client: AsyncQdrantClient = None, cache: QueryEmbeddingCache = None, executor: BoundedExecutor = None, batcher: MicroBatchEncoder = None, search_params: SearchParams = None, payload_fields: list = SEARCH_PAYLOAD_FIELDS, chunk_overfetch: int = SEARCH_CHUNK_OVERFETCH):
         """
         Args:
             collection_name (str): The name of the collection to search in.
             model (object): A sentence transformer model to convert text to vectors.
-            qdrant_host (str, optional): The address of the Qdrant server. Defaults to "http://localhost:6333".
+            qdrant_host (str, optional): The address of the Qdrant server. Defaults to QDRANT_HOST.
+            qdrant_client (QdrantClient, optional): Client used by ``search``. A new client for
+                ``qdrant_host`` is created if not given, so callers can share one client.
+            async_client (AsyncQdrantClient, optional): Client used by ``asearch``. A new client
+                for ``qdrant_host`` is created if not given.
+            cache (QueryEmbeddingCache, optional): Cache of query vectors. A new cache is created if not given.
+            executor (BoundedExecutor, optional): Threads that run the model for ``asearch``.
+                A new executor with ENCODE_WORKERS threads is created if not given.
+            batcher (MicroBatchEncoder, optional): Groups concurrent ``asearch`` encodes into
+                batches. A new batcher on ``executor`` is created if not given.
+            search_params (SearchParams, optional): Default HNSW and quantization search
+                parameters. Built from SEARCH_HNSW_EF, SEARCH_OVERSAMPLING and SEARCH_RESCORE if not given.
+            payload_fields (list, optional): Payload fields returned with each hit. Document
+                metadata is not stored in the points, see ``DocumentStore``. Defaults to SEARCH_PAYLOAD_FIELDS.
+            chunk_overfetch (int, optional): Points fetched per result. A long page is stored
+                as several chunks and only its best chunk is returned, so ``top`` times this
+                many points are requested to still fill ``top`` pages. Defaults to SEARCH_CHUNK_OVERFETCH.
         """
         self.collection_name = collection_name
         self.model = model
-        self.qdrant_client = QdrantClient(qdrant_host)
+        self.qdrant_client = qdrant_client if qdrant_client is not None else QdrantClient(qdrant_host)
+        self.async_client = async_client if async_client is not None else AsyncQdrantClient(qdrant_host)
+        self.cache = cache if cache is not None else QueryEmbeddingCache()
+        self.executor = executor if executor is not None else BoundedExecutor(
+            max_workers=ENCODE_WORKERS,
+            max_pending=ENCODE_MAX_PENDING,
+            name="encode",
+        )
+        self.batcher = batcher if batcher is not None else MicroBatchEncoder(self.model, self.executor)
+        self.search_params = search_params if search_params is not None else SearchParams(
+            hnsw_ef=SEARCH_HNSW_EF,
+            quantization=QuantizationSearchParams(rescore=SEARCH_RESCORE, oversampling=SEARCH_OVERSAMPLING),
+        )
+        self.payload_fields = payload_fields
+        self.chunk_overfetch = max(1, chunk_overfetch)
 
-    def search(self, query: str, location: list = None, top: int = 5) -> list:
+    def encode_query(self, query: str) -> list:
         """
-        Search for the most similar items to the given text in the collection.
+        Convert a query to a vector, reusing the cached vector of an identical query.
 
         Args:
-            query (str): The text to search for.
-            location (list, optional): List of location strings for filtering.
-            top (int, optional): The number of results to return per location. Defaults to 5.
+            query (str): The text to encode.
 
         Returns:
-            list: A list of payloads (dictionaries) of the most similar items.
+            list: The query vector.
         """
-        vector = self.model.encode(query).tolist()
-        results = []
+        text = normalize_query(query)
+        model_key = model_identity(self.model)
+        vector = self.cache.get(text, model_key)
+        if vector is None:
+            with stage("encode"):
+                vector = self.model.encode(text)
+            self.cache.put(text, model_key, vector)
+        return vector.tolist()
+
+    async def aencode_query(self, query: str) -> list:
+        """
+        Same as ``encode_query``, but a cache miss is encoded by the micro-batcher
+        on the executor, so the event loop is never blocked by inference.
+
+        Raises:
+            QueueFullError: If the executor already has too many pending batches.
+        """
+        text = normalize_query(query)
+        model_key = model_identity(self.model)
+        vector = self.cache.get(text, model_key)
+        if vector is None:
+            # รวมเวลารอใน micro-batch ด้วย เพราะเป็นเวลาที่ request รอจริง
+            with stage("encode"):
+                vector = await self.batcher.encode(text)
+            self.cache.put(text, model_key, vector)
+        return vector.tolist()
+
+    def build_requests(self, vector: list, location: list = None, top: int = 5, params: SearchParams = None) -> list:
+        """
+        Build one query request per location, or a single unfiltered request.
+
+        Args:
+            vector (list): The query vector.
+            location (list, optional): List of faculties for filtering. Each faculty is
+                matched exactly against the indexed ``faculty`` payload field.
+            top (int, optional): The number of pages per request; ``top * chunk_overfetch``
+                points are requested. Defaults to 5.
+            params (SearchParams, optional): Search parameters. Defaults to ``self.search_params``.
 
-        # ถ้ามีหลาย location ให้ query แยกแต่ละ location แล้วรวมผลลัพธ์
-        if location:
-            for loc in location:
-                query_filter = Filter(
+        Returns:
+            list: A list of QueryRequest objects for ``query_batch_points``.
+        """
+        params = params or self.search_params
+        limit = top * self.chunk_overfetch
+
+        # ถ้าไม่ระบุ location ก็หา top n ทั้งหมด
+        if not location:
+            return [QueryRequest(query=vector, limit=limit, params=params, with_payload=self.payload_fields)]
+
+        # ถ้ามีหลาย location ให้ query แยกแต่ละ location ใน request เดียว แล้วรวมผลลัพธ์
+        return [
+            QueryRequest(
+                query=vector,
+                filter=Filter(
                     must=[
                         FieldCondition(
-                            key="location",
-                            match=MatchText(text=loc),
+                            key="faculty",
+                            match=MatchValue(value=normalize_faculty(loc)),
                         )
                     ]
-                )
+                ),
+                limit=limit,
+                params=params,
+                with_payload=self.payload_fields,
+            )
+            for loc in location
+        ]
 
-                search_result = self.qdrant_client.query_points(
-                    collection_name=self.collection_name,
-                    query=vector,
-                    query_filter=query_filter,
-                    limit=top,
-                ).points
-
-                location_results = [
-                    {"payload": hit.payload, "score": hit.score}
-                    for hit in search_result
-                ]
-                results.extend(location_results)
-        else:
-            # ถ้าไม่ระบุ location ก็หา top n ทั้งหมด
-            search_result = self.qdrant_client.query_points(
-                collection_name=self.collection_name,
-                query=vector,
-                limit=top,
-            ).points
+    @staticmethod
+    def collect(batch_result: list, top: int) -> list:
+        """
+        Keep the best chunk of each page, up to ``top`` pages per response.
 
-            results = [
-                {"payload": hit.payload, "score": hit.score}
-                for hit in search_result
-            ]
+        Args:
+            batch_result (list): Responses of ``query_batch_points``, one per request.
+            top (int): The number of pages to keep per response.
 
+        Returns:
+            list: Hits with their ``payload`` and ``score``, in the order of the responses.
+        """
+        results = []
+        for response in batch_result:
+            seen = set()
+            for hit in response.points:
+                # point เรียงตาม score อยู่แล้ว chunk แรกของหน้าจึงเป็น chunk ที่ดีที่สุด
+                key = (hit.payload.get("doc_id"), hit.payload.get("page"))
+                if key in seen:
+                    continue
+                seen.add(key)
+                results.append({"payload": hit.payload, "score": hit.score})
+                if len(seen) == top:
+                    break
         return results
-    
+
+    def search(self, query: str, location: list = None, top: int = 5, params: SearchParams = None) -> list:
+        """
+        Search for the most similar items to the given text in the collection.
+
+        Args:
+            query (str): The text to search for.
+            location (list, optional): List of location strings for filtering.
+            top (int, optional): The number of results to return per location. Defaults to 5.
+            params (SearchParams, optional): HNSW ef and quantization oversampling/rescore
+                parameters of this search. Defaults to ``self.search_params``.
+
+        Returns:
+            list: A list of payloads (dictionaries) of the most similar items, with
+            the fields of ``payload_fields``.
+        """
+        vector = self.encode_query(query)
+        with stage("qdrant"):
+            batch_result = self.qdrant_client.query_batch_points(
+                collection_name=self.collection_name,
+                requests=self.build_requests(vector, location, top, params),
+            )
+        return self.collect(batch_result, top)
+
+    async def asearch(self, query: str, location: list = None, top: int = 5, params: SearchParams = None) -> list:
+        """
+        Non-blocking version of ``search`` for the FastAPI service. The model runs
+        on the executor and Qdrant is queried with the async client.
+        """
+        vector = await self.aencode_query(query)
+        with stage("qdrant"):
+            batch_result = await self.async_client.query_batch_points(
+                collection_name=self.collection_name,
+                requests=self.build_requests(vector, location, top, params),
+            )
+        return self.collect(batch_result, top)
+
+    async def astream(self, query: str, location: list = None, top: int = 5, params: SearchParams = None):
+        """
+        Same as ``asearch``, but every location is queried separately and its hits
+        are yielded as soon as Qdrant returns them, so the first location does not
+        wait for the slowest one.
+
+        Yields:
+            tuple: ``(location, hits)`` in the order the queries finish; ``location``
+            is None for a search without locations.
+        """
+        vector = await self.aencode_query(query)
+
+        async def query_one(loc, request):
+            with stage("qdrant"):
+                batch_result = await self.async_client.query_batch_points(
+                    collection_name=self.collection_name,
+                    requests=[request],
+                )
+            return loc, self.collect(batch_result, top)
+
+        requests = self.build_requests(vector, location, top, params)
+        tasks = [asyncio.create_task(query_one(loc, request)) for loc, request in zip(location or [None], requests)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # client ปิดการเชื่อมต่อกลางทาง ก็ไม่ต้อง query location ที่เหลือ
+            for task in tasks:
+                task.cancel()
+
 if __name__ == "__main__":
     collection_name = COLLECTION_NAME
-    model = SentenceTransformer("BAAI/bge-m3", device="cuda")
-    qdrant_host = "http://localhost:6333"
+    from backend.encoder import load_encoder
+    model = load_encoder()
+    qdrant_host = QDRANT_HOST
 
     neural_searcher = NeuralSearcher(
         collection_name=collection_name,
@@ -85,4 +241,4 @@ if __name__ == "__main__":
     # print(neural_searcher.search("อาชีพผู้ดูแลระบบ"))
     file_name = neural_searcher.search(query="อาชีพ", location=location, top=10)
     for i in file_name:
-        print(i['payload']['file_name'])
\ No newline at end of file
+        print(i['payload']['doc_id'], i['payload']['page'])
\ No newline at end of file
@@ -1,12 +1,29 @@
+import re
 import json
+import time
+import uuid
+import queue
+import threading
 from tqdm import tqdm
-from math import ceil
-from sentence_transformers import SentenceTransformer
+from itertools import islice
 from qdrant_client import QdrantClient
-from qdrant_client.models import VectorParams, Distance
-from typing import Generator
-from config.config import FILE_EXTRACT, COLLECTION_NAME
+from qdrant_client.models import (
+    VectorParams, Distance, PointIdsList, HnswConfigDiff,
+    PayloadSchemaType, TextIndexParams, TextIndexType, TokenizerType,
+    ScalarQuantization, ScalarQuantizationConfig, ScalarType,
+    BinaryQuantization, BinaryQuantizationConfig,
+    CreateAlias, CreateAliasOperation, DeleteAlias, DeleteAliasOperation,
+)
+from typing import Iterator
+from config.config import (
+    FILE_EXTRACT, FILE_INDEX_GENERATION, COLLECTION_NAME, QDRANT_HOST, UPLOAD_BATCH_SIZE, ENCODE_BATCH_SIZE, UPLOAD_WORKERS, UPLOAD_QUEUE_SIZE,
+    CHUNK_MAX_TOKENS, CHUNK_OVERLAP, ENCODE_SORT_WINDOW,
+    VECTOR_SIZE, QDRANT_QUANTIZATION, QDRANT_ON_DISK, QDRANT_HNSW_M, QDRANT_HNSW_EF_CONSTRUCT,
+)
 from config.logging_config.modern_log import LoggingConfig
+from backend.embedding_store import EmbeddingStore, content_digest
+from backend.result_cache import bump_generation
+from backend.utils import model_version
 import numpy as np
 # ---------------------------------------------------------------------------- #
 #                                LOGGING CONFIG                                #
@@ -14,8 +31,102 @@ import numpy as np
 logger = LoggingConfig(level="INFO").get_logger("qdrant_upload")
 # ---------------------------------------------------------------------------- #
     
+POINT_ID_NAMESPACE = uuid.UUID("6f1d7a8e-3c1b-4b7e-9a55-2f0c4e9d1b63")
+
+def point_id(record: dict) -> str:
+    """
+    Deterministic point id of a passage.
+
+    The id is derived from the document id, page number, chunk number and a hash
+    of the content, so an unchanged passage keeps its id between runs and a
+    changed passage gets a new one.
+
+    Args:
+        record (dict): A passage produced by ``VectorUploader.chunk_record``.
+
+    Returns:
+        str: A UUID string usable as a Qdrant point id.
+    """
+    content_hash = content_digest(record["content"]).hex()
+    return str(uuid.uuid5(POINT_ID_NAMESPACE, f"{record['doc_id']}\x00{record['page']}\x00{record.get('chunk', 0)}\x00{content_hash}"))
+
+def collection_params(
+    quantization: str = QDRANT_QUANTIZATION,
+    on_disk: bool = QDRANT_ON_DISK,
+    hnsw_m: int = QDRANT_HNSW_M,
+    hnsw_ef_construct: int = QDRANT_HNSW_EF_CONSTRUCT,
+) -> dict:
+    """
+    Storage settings of a new collection.
+
+    Args:
+        quantization (str, optional): "none", "scalar" (int8) or "binary". Quantized
+            vectors are always kept in RAM. Defaults to QDRANT_QUANTIZATION.
+        on_disk (bool, optional): Keep the original float32 vectors on disk. Defaults to QDRANT_ON_DISK.
+        hnsw_m (int, optional): Edges per node of the HNSW graph. Defaults to QDRANT_HNSW_M.
+        hnsw_ef_construct (int, optional): Neighbours considered while building the graph. Defaults to QDRANT_HNSW_EF_CONSTRUCT.
+
+    Returns:
+        dict: Keyword arguments for ``QdrantClient.create_collection``.
+
+    Raises:
+        ValueError: If ``quantization`` is not one of the supported values.
+    """
+    if quantization == "scalar":
+        quantization_config = ScalarQuantization(
+            scalar=ScalarQuantizationConfig(type=ScalarType.INT8, quantile=0.99, always_ram=True)
+        )
+    elif quantization == "binary":
+        quantization_config = BinaryQuantization(binary=BinaryQuantizationConfig(always_ram=True))
+    elif quantization == "none":
+        quantization_config = None
+    else:
+        raise ValueError(f"Unknown quantization '{quantization}', expected none, scalar or binary")
+
+    return {
+        "vectors_config": VectorParams(size=VECTOR_SIZE, distance=Distance.COSINE, on_disk=on_disk),
+        "hnsw_config": HnswConfigDiff(m=hnsw_m, ef_construct=hnsw_ef_construct),
+        "quantization_config": quantization_config,
+    }
+
+PAYLOAD_INDEXES = {
+    "faculty": PayloadSchemaType.KEYWORD,
+    # multilingual tokenizer ตัดคำภาษาไทยได้ ต่างจาก word tokenizer ที่แยกด้วยช่องว่างอย่างเดียว
+    "content": TextIndexParams(
+        type=TextIndexType.TEXT,
+        tokenizer=TokenizerType.MULTILINGUAL,
+        lowercase=True,
+        min_token_len=1,
+    ),
+}
+
+# field ที่ทุก point ต้องมี ถ้า collection เดิมไม่มีแปลว่าสร้างจาก layout เก่า
+PAGE_FIELDS = ("doc_id", "faculty")
+
+class StageStats:
+    def __init__(self, name: str):
+        """
+        Thread-safe counter of items processed by a pipeline stage and the time spent on them.
+
+        Args:
+            name (str): Name of the stage, used in the report.
+        """
+        self.name = name
+        self.items = 0
+        self.busy = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, items: int, seconds: float) -> None:
+        with self._lock:
+            self.items += items
+            self.busy += seconds
+
+    def report(self, wall: float) -> str:
+        rate = self.items / self.busy if self.busy else 0.0
+        return f"{self.name}: {self.items} vectors, busy {self.busy:.1f}s ({rate:.1f} vectors/s), {self.busy / wall:.0%} of wall time"
+
 class VectorUploader:
-    def __init__(self, json_path: str, collection_name: str, model: object, qdrant_host: str = "http://localhost:6333"):
+    def __init__(self, json_path: str, collection_name: str, model: object, qdrant_host: str = QDRANT_HOST, qdrant_client: QdrantClient = None, embedding_store: EmbeddingStore = None, generation_path: str = FILE_INDEX_GENERATION):
         """
         Initialize a VectorUploader instance.
 
@@ -23,98 +134,418 @@ class VectorUploader:
             json_path (str): The path to the JSON lines file containing the data to upload.
             collection_name (str): The name of the Qdrant collection to upload vectors to.
             model (object): A sentence transformer model to encode data into vectors.
-            qdrant_host (str, optional): The address of the Qdrant server. Defaults to "http://localhost:6333".
+            qdrant_host (str, optional): The address of the Qdrant server. Defaults to QDRANT_HOST.
+            qdrant_client (QdrantClient, optional): Client to upload with. A new client for
+                ``qdrant_host`` is created if not given.
+            embedding_store (EmbeddingStore, optional): On-disk cache of passage vectors. A store
+                for ``model_version(model)`` in EMBEDDING_STORE_DIR is opened if not given.
+            generation_path (str, optional): Index generation bumped after every upload.
+                Defaults to FILE_INDEX_GENERATION.
         """
         self.json_path = json_path
         self.collection_name = collection_name
         self.model = model
-        self.client = QdrantClient(qdrant_host)
+        self.client = qdrant_client if qdrant_client is not None else QdrantClient(qdrant_host)
+        self.embedding_store = embedding_store if embedding_store is not None else EmbeddingStore(model_version(model))
+        self.generation_path = generation_path
 
-    def load_data(self) -> list:
+    def count_lines(self) -> int:
         """
-        Load data from a JSON lines file specified by the json_path attribute.
+        Count the records in the JSON lines file without parsing them.
 
         Returns:
-            list: A list of dictionaries, where each dictionary is a parsed JSON object
-            from a line in the input file.
+            int: The number of lines in the file.
+        """
+        count = 0
+        with open(self.json_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                count += block.count(b"\n")
+        return count
+
+    def iter_records(self) -> Iterator[dict]:
+        """
+        Stream records from the JSON lines file specified by the json_path attribute.
+
+        Yields:
+            dict: A parsed JSON object from a line in the input file.
         """
-        data = []
         with open(self.json_path, encoding="utf-8") as f:
             for line in f:
-                data.append(json.loads(line))
-        logger.info(f"Loaded {len(data)} vectors from {self.json_path}")
-        return data
+                if line.strip():
+                    yield json.loads(line)
+
+    def token_spans(self, text: str) -> list:
+        """
+        Character spans of the model tokens of a text.
+
+        Uses the tokenizer of the model when it has one, and whitespace-separated
+        words otherwise.
+
+        Args:
+            text (str): Text to tokenize.
+
+        Returns:
+            list: ``(start, end)`` character offsets of each token.
+        """
+        tokenizer = getattr(self.model, "tokenizer", None)
+        if tokenizer is None:
+            return [match.span() for match in re.finditer(r"\S+", text)]
+        encoded = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True, verbose=False)
+        return encoded["offset_mapping"]
 
-    def batch_encode(self, texts, batch_size=64) -> Generator[np.ndarray, None, None]:
+    def chunk_record(self, record: dict, max_tokens: int = CHUNK_MAX_TOKENS, overlap: int = CHUNK_OVERLAP) -> list:
         """
-        Encode a list of text strings in batches.
+        Split a page into overlapping passages of at most ``max_tokens`` tokens.
+
+        Each passage keeps the payload of its page, with ``content`` replaced by
+        the passage text, a ``chunk`` number and its ``tokens`` count. Pages that
+        fit in one passage are returned as a single passage.
+
+        Args:
+            record (dict): A record of the extracted JSON lines file.
+            max_tokens (int, optional): Maximum tokens per passage. Defaults to CHUNK_MAX_TOKENS.
+            overlap (int, optional): Tokens shared by consecutive passages, at most half of
+                ``max_tokens``. Defaults to CHUNK_OVERLAP.
+
+        Returns:
+            list: The passages of the page.
+        """
+        max_seq_length = getattr(self.model, "max_seq_length", None)
+        if max_seq_length:
+            # เผื่อที่ให้ special tokens ([CLS]/[SEP]) ของโมเดล
+            max_tokens = min(max_tokens, max_seq_length - 2)
+        # overlap ต้องไม่เกินครึ่งของ passage หลังลด max_tokens แล้ว ไม่อย่างนั้นทุกหน้าจะแตกเป็น passage ละ token
+        overlap = min(overlap, max_tokens // 2)
+        content = record["content"]
+        spans = self.token_spans(content)
+        if len(spans) <= max_tokens:
+            return [{**record, "chunk": 0, "tokens": len(spans)}]
+
+        chunks = []
+        stride = max(max_tokens - overlap, 1)
+        for start in range(0, len(spans), stride):
+            window = spans[start:start + max_tokens]
+            chunks.append({
+                **record,
+                "content": content[window[0][0]:window[-1][1]],
+                "chunk": len(chunks),
+                "tokens": len(window),
+            })
+            if start + max_tokens >= len(spans):
+                break
+        return chunks
+
+    def batch_encode(self, texts: list, lengths: list, batch_size: int = ENCODE_BATCH_SIZE) -> np.ndarray:
+        """
+        Encode text strings in batches of similar length.
+
+        The texts are sorted by token length so each batch is padded only to the
+        length of similar texts, encoded batch by batch, and the vectors are put
+        back in the order of the input.
 
         Args:
             texts (list): A list of text strings to be encoded.
-            batch_size (int, optional): The number of text strings to encode in each batch. Defaults to 64.
+            lengths (list): Token length of each text.
+            batch_size (int, optional): The number of text strings to encode in each batch. Defaults to ENCODE_BATCH_SIZE.
 
-        Yields:
-            numpy.ndarray: A batch of encoded vectors for the input text strings.
+        Returns:
+            numpy.ndarray: The vectors of the texts, in input order.
+        """
+        order = np.argsort(lengths, kind="stable")
+        vectors = None
+        for i in range(0, len(order), batch_size):
+            index = order[i:i + batch_size]
+            encoded = self.model.encode([texts[j] for j in index], batch_size=len(index), show_progress_bar=False)
+            if vectors is None:
+                vectors = np.empty((len(texts), encoded.shape[1]), dtype=encoded.dtype)
+            vectors[index] = encoded
+        return vectors
+
+    def cached_encode(self, texts: list, lengths: list) -> np.ndarray:
+        """
+        Encode text strings, reusing the vectors of ``embedding_store``.
+
+        Only passages whose content is not in the store are encoded (with
+        ``batch_encode``); their vectors are added to the store.
+
+        Args:
+            texts (list): A list of text strings to be encoded.
+            lengths (list): Token length of each text.
+
+        Returns:
+            numpy.ndarray: The vectors of the texts, in input order.
+        """
+        digests = [content_digest(text) for text in texts]
+        rows = self.embedding_store.lookup(digests)
+        missing = np.flatnonzero(rows < 0)
+        if len(missing):
+            vectors = self.batch_encode([texts[i] for i in missing], [lengths[i] for i in missing])
+            rows[missing] = self.embedding_store.add([digests[i] for i in missing], vectors)
+        return self.embedding_store.take(rows)
+
+    def resolve_collection(self) -> str:
+        """
+        Find the collection currently served under ``collection_name``.
+
+        Returns:
+            str: The collection the alias points to, ``collection_name`` itself if it
+            is a plain collection from before aliases were used, or None if neither exists.
+        """
+        for alias in self.client.get_aliases().aliases:
+            if alias.alias_name == self.collection_name:
+                return alias.collection_name
+        if self.client.collection_exists(self.collection_name):
+            return self.collection_name
+        return None
+
+    def create_collection(self, name: str) -> None:
+        """
+        Create a collection with the storage settings of ``collection_params``
+        and the payload indexes of ``PAYLOAD_INDEXES``.
+        The storage settings apply to new collections, so changing them takes a full rebuild.
+        """
+        self.client.create_collection(collection_name=name, **collection_params())
+        try:
+            self.ensure_payload_indexes(name)
+        except Exception:
+            self.client.delete_collection(name)
+            raise
+
+    def ensure_payload_indexes(self, collection_name: str) -> None:
+        """
+        Create the payload indexes of ``PAYLOAD_INDEXES`` that a collection does not have yet.
+        """
+        existing = self.client.get_collection(collection_name).payload_schema
+        for field_name, schema in PAYLOAD_INDEXES.items():
+            if field_name not in existing:
+                self.client.create_payload_index(
+                    collection_name=collection_name,
+                    field_name=field_name,
+                    field_schema=schema,
+                )
+
+    def has_page_layout(self, collection_name: str) -> bool:
+        """
+        Check whether the points of a collection carry the ``PAGE_FIELDS`` that
+        the searchers rely on. Collections built before those fields existed need
+        a full rebuild, because an incremental run only adds new points.
         """
-        for i in range(0, len(texts), batch_size):
-            yield self.model.encode(texts[i:i + batch_size], show_progress_bar=False)
+        points, _ = self.client.scroll(collection_name=collection_name, limit=1, with_payload=list(PAGE_FIELDS), with_vectors=False)
+        return not points or all(field in (points[0].payload or {}) for field in PAGE_FIELDS)
 
-    def upload(self) -> None:
+    def existing_ids(self, collection_name: str) -> set:
+        """
+        Read the ids of every point in a collection, without payloads or vectors.
+
+        Returns:
+            set: Point ids as strings.
+        """
+        ids = set()
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=collection_name,
+                limit=10000,
+                offset=offset,
+                with_payload=False,
+                with_vectors=False,
+            )
+            ids.update(str(point.id) for point in points)
+            if offset is None:
+                return ids
+
+    def swap_alias(self, new_collection: str, old_collection: str = None) -> None:
+        """
+        Point ``collection_name`` at ``new_collection`` in one atomic alias update,
+        then drop the collection it pointed to before.
+
+        Args:
+            new_collection (str): The freshly built collection.
+            old_collection (str, optional): The collection served before the swap.
+        """
+        operations = []
+        if old_collection == self.collection_name:
+            # collection เดิมใช้ชื่อเดียวกับ alias ต้องลบก่อนจึงสร้าง alias ได้ (เกิดครั้งเดียวตอนย้ายมาใช้ alias)
+            logger.warning(f"Replacing plain collection '{old_collection}' with an alias, search is unavailable until the alias is created")
+            self.client.delete_collection(old_collection)
+        elif old_collection:
+            operations.append(DeleteAliasOperation(delete_alias=DeleteAlias(alias_name=self.collection_name)))
+        operations.append(CreateAliasOperation(create_alias=CreateAlias(collection_name=new_collection, alias_name=self.collection_name)))
+        self.client.update_collection_aliases(change_aliases_operations=operations)
+        if old_collection and old_collection != self.collection_name:
+            self.client.delete_collection(old_collection)
+        logger.info(f"Alias '{self.collection_name}' now points to '{new_collection}'")
+
+    def upload(
+        self,
+        full: bool = False,
+        batch_size: int = UPLOAD_BATCH_SIZE,
+        workers: int = UPLOAD_WORKERS,
+        queue_size: int = UPLOAD_QUEUE_SIZE,
+    ) -> None:
         """
         Uploads vector data to a Qdrant collection. This method performs the following steps:
-        1. Loads data from a JSON lines file.
-        2. Deletes the existing collection if it exists.
-        3. Creates a new collection with specified vector configuration.
-        4. Encodes the content data into vectors in batches.
-        5. Uploads batches of vectors along with their payload to the Qdrant collection.
+        1. Streams the JSON lines file and splits each page into token-bounded passages.
+        2. Gives every passage a deterministic id from its document id, page, chunk and content hash.
+        3. Encodes new or changed passages into vectors, sorted by token length.
+           Passages whose content was encoded by an earlier run are read from
+           ``embedding_store`` instead, so a full rebuild after a small corpus
+           change only encodes the changed passages.
+        4. Uploads the vectors along with their page payload (document id, faculty,
+           page, chunk and content) under those ids. Document metadata is not
+           stored in Qdrant, see ``DocumentStore``.
+        5. Deletes the points of passages that no longer exist, and compacts the
+           vectors of those passages out of ``embedding_store``.
+        6. Bumps the index generation, which clears the search result caches of
+           the running services.
+
+        ``collection_name`` is served through an alias. An incremental run updates
+        the collection behind the alias in place and skips pages whose id already
+        exists. A full run (or the first run) builds a new collection next to the
+        served one and swaps the alias to it when complete, so searches never see
+        an empty or partial index.
 
-        The method ensures that the collection is replaced with fresh data each time it is called.
+        Encoding and uploading run concurrently: the calling thread encodes
+        batches and puts them on a bounded queue, and ``workers`` threads upload
+        them. Only the batches on the queue are held in memory.
+
+        Args:
+            full (bool, optional): Rebuild the collection from scratch. Defaults to False.
+            batch_size (int, optional): Passages uploaded together. Passages are sorted by
+                length across ENCODE_SORT_WINDOW batches before encoding. Defaults to UPLOAD_BATCH_SIZE.
+            workers (int, optional): Threads uploading batches to Qdrant. Defaults to UPLOAD_WORKERS.
+            queue_size (int, optional): Encoded batches waiting for upload. Defaults to UPLOAD_QUEUE_SIZE.
 
         Raises:
             Exception: If there is an issue with creating or uploading to the Qdrant collection.
 
         Logs:
-            Info level log indicating the number of vectors successfully uploaded.
+            Info level log indicating the number of vectors uploaded, skipped and
+            deleted, and the throughput of each stage.
         """
-        data = self.load_data()
-        contents = [item["content"] for item in data]
-        payloads = data
+        total = self.count_lines()
+        logger.info(f"Streaming {total} records from {self.json_path}")
 
-        # remove collection if exists
-        if self.client.collection_exists(self.collection_name):
-            self.client.delete_collection(self.collection_name)
+        current = self.resolve_collection()
+        if current is not None and not full and not self.has_page_layout(current):
+            logger.warning(f"Collection '{current}' uses an old payload layout, rebuilding it")
+            full = True
+        target = current
+        created = False
+        try:
+            if full or current is None:
+                target = f"{self.collection_name}_{time.strftime('%Y%m%d%H%M%S')}"
+                self.create_collection(target)
+                created = True
+                existing = set()
+                logger.info(f"Building new collection '{target}'")
+            else:
+                self.ensure_payload_indexes(target)
+                existing = self.existing_ids(target)
+                logger.info(f"Updating collection '{target}' with {len(existing)} points")
 
-        # create new collection 
-        self.client.create_collection(
-            collection_name=self.collection_name,
-            vectors_config=VectorParams(size=1024, distance=Distance.COSINE),
-        )
+            encode_stats = StageStats("encode")
+            upload_stats = StageStats("upload")
+            batches = queue.Queue(maxsize=queue_size)
+            errors = []
+            desired = set()
+            referenced = set()
+            started = time.perf_counter()
 
-        ids_counter = 0
-        batch_size = 256
-        # batch_size = 128
-
-        total_batches = ceil(len(contents) / batch_size)
-        for i, vectors in enumerate(tqdm(self.batch_encode(contents, batch_size), total=total_batches)):
-            payload_batch = payloads[i * batch_size : (i + 1) * batch_size]
-            self.client.upload_collection(
-                collection_name=self.collection_name,
-                vectors=vectors,
-                payload=payload_batch,
-                ids=None,
-                batch_size=batch_size,
-            )
-            ids_counter += len(vectors)
+            with tqdm(total=total, unit="page") as progress:
+                def changed_records():
+                    for record in self.iter_records():
+                        progress.update(1)
+                        for chunk in self.chunk_record(record):
+                            referenced.add(content_digest(chunk["content"]))
+                            record_id = point_id(chunk)
+                            desired.add(record_id)
+                            if record_id not in existing:
+                                yield record_id, chunk
+
+                def upload_worker():
+                    while True:
+                        item = batches.get()
+                        if item is None:
+                            return
+                        if errors:
+                            continue
+                        ids, payload_batch, vectors = item
+                        t0 = time.perf_counter()
+                        try:
+                            self.client.upload_collection(
+                                collection_name=target,
+                                vectors=vectors,
+                                payload=payload_batch,
+                                ids=ids,
+                                batch_size=batch_size,
+                            )
+                        except Exception as e:
+                            errors.append(e)
+                            continue
+                        upload_stats.add(len(vectors), time.perf_counter() - t0)
+
+                threads = [threading.Thread(target=upload_worker, name=f"upload-{i}", daemon=True) for i in range(workers)]
+                for thread in threads:
+                    thread.start()
+                try:
+                    records = changed_records()
+                    # เรียงตามความยาวภายในหน้าต่างหลาย batch เพื่อลด padding แล้วค่อยแบ่งส่งขึ้น Qdrant
+                    while window := list(islice(records, batch_size * ENCODE_SORT_WINDOW)):
+                        if errors:
+                            break
+                        ids, payloads = map(list, zip(*window))
+                        t0 = time.perf_counter()
+                        vectors = self.cached_encode(
+                            [item["content"] for item in payloads],
+                            [item.pop("tokens") for item in payloads],
+                        )
+                        encode_stats.add(len(vectors), time.perf_counter() - t0)
+                        for i in range(0, len(window), batch_size):
+                            batches.put((ids[i:i + batch_size], payloads[i:i + batch_size], vectors[i:i + batch_size]))
+                finally:
+                    for _ in threads:
+                        batches.put(None)
+                    for thread in threads:
+                        thread.join()
+
+            if errors:
+                raise errors[0]
+
+            stale = list(existing - desired)
+            for i in range(0, len(stale), 10000):
+                self.client.delete(collection_name=target, points_selector=PointIdsList(points=stale[i:i + 10000]))
+        except Exception:
+            # ไม่ว่าพังตอน encode หรือ upload ก็ไม่ทิ้ง collection ที่สร้างไม่เสร็จไว้ alias ยังชี้ collection เดิม
+            if created:
+                logger.warning(f"Build failed, deleting the partial collection '{target}'")
+                try:
+                    self.client.delete_collection(target)
+                except Exception as e:
+                    logger.warning(f"Could not delete '{target}': {e}")
+            raise
+
+        if target != current:
+            self.swap_alias(target, current)
+        # ให้ service ล้างผลค้นหาที่ cache ไว้จาก index เดิม
+        bump_generation(self.generation_path)
+
+        compacted = self.embedding_store.compact(referenced)
+        store_stats = self.embedding_store.stats()
+        logger.info(f"Embedding store: {store_stats['hits']} reused, {store_stats['misses']} encoded, {compacted} compacted, {store_stats['rows']} stored")
 
-        logger.info(f"Successfully Uploaded {ids_counter} vectors.")
+        wall = time.perf_counter() - started
+        logger.info(f"Successfully Uploaded {upload_stats.items} vectors in {wall:.1f}s ({upload_stats.items / wall:.1f} vectors/s), {len(desired & existing)} unchanged, {len(stale)} deleted.")
+        logger.info(encode_stats.report(wall))
+        logger.info(upload_stats.report(wall))
 
 if __name__ == "__main__":
-    import torch
-    torch.cuda.empty_cache()
+    import sys
+    from backend.encoder import load_encoder
     json_path = FILE_EXTRACT
     collection_name = COLLECTION_NAME
-    model = SentenceTransformer("BAAI/bge-m3", device="cuda")
-    qdrant_host = "http://localhost:6333"
+    model = load_encoder()
+    qdrant_host = QDRANT_HOST
 
     uploader = VectorUploader(
         json_path=json_path,
@@ -123,4 +554,4 @@ if __name__ == "__main__":
         qdrant_host=qdrant_host,
     )
     
-    uploader.upload()
+    uploader.upload(full="--full" in sys.argv)
@@ -0,0 +1,226 @@
+import os
+import json
+import time
+import asyncio
+from collections import OrderedDict
+
+from config.config import FILE_INDEX_GENERATION, RESULT_CACHE_MAX_ENTRIES, RESULT_CACHE_MAX_BYTES, RESULT_CACHE_TTL
+
+
+def read_generation(path: str = FILE_INDEX_GENERATION) -> int:
+    """
+    Returns:
+        int: The index generation stored in ``path``, or 0 if there is none yet.
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            return int(f.read().strip() or 0)
+    except (OSError, ValueError):
+        return 0
+
+
+def bump_generation(path: str = FILE_INDEX_GENERATION) -> int:
+    """
+    Increase the index generation after an ingest, so every service drops the
+    search results it cached from the previous index.
+
+    Returns:
+        int: The new generation.
+    """
+    generation = read_generation(path) + 1
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(str(generation))
+    os.replace(tmp_path, path)
+    return generation
+
+
+class SearchResultCache:
+    def __init__(
+        self,
+        max_entries: int = RESULT_CACHE_MAX_ENTRIES,
+        max_bytes: int = RESULT_CACHE_MAX_BYTES,
+        ttl: float = RESULT_CACHE_TTL,
+        generation_path: str = FILE_INDEX_GENERATION,
+    ):
+        """
+        In-memory LRU cache of search results, used from the event loop.
+
+        Entries are evicted when the cache holds more than ``max_entries``
+        results, when their JSON size exceeds ``max_bytes``, or when an entry is
+        older than ``ttl`` seconds. The cache is cleared whenever the index
+        generation in ``generation_path`` changes, which ``VectorUploader`` and
+        ``LexicalIndex.build`` bump after every ingest.
+
+        Identical requests that arrive while the first one is still being
+        computed wait for its result instead of searching again (single-flight).
+
+        Args:
+            max_entries (int, optional): Maximum number of cached results.
+            max_bytes (int, optional): Maximum total JSON size of cached results in bytes.
+            ttl (float, optional): Time to live of an entry in seconds. 0 disables expiry.
+            generation_path (str, optional): File holding the index generation.
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.generation_path = generation_path
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._bytes = 0
+        self._generation = read_generation(generation_path)
+        self._generation_mtime = None
+
+    def _check_generation(self) -> None:
+        try:
+            mtime = os.stat(self.generation_path).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime == self._generation_mtime:
+            return
+        self._generation_mtime = mtime
+        generation = read_generation(self.generation_path)
+        if generation != self._generation:
+            self._generation = generation
+            self.clear()
+            self.invalidations += 1
+
+    def _pop(self, key: tuple) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def _get(self, key: tuple):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        result, _, stored_at = entry
+        if self.ttl and time.monotonic() - stored_at > self.ttl:
+            self._pop(key)
+            self.evictions += 1
+            return None
+        self._entries.move_to_end(key)
+        return result
+
+    def _put(self, key: tuple, result: list) -> None:
+        size = len(json.dumps(result, ensure_ascii=False, default=str).encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._pop(key)
+        self._entries[key] = (result, size, time.monotonic())
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            self._pop(next(iter(self._entries)))
+            self.evictions += 1
+
+    @property
+    def generation(self) -> int:
+        """The index generation of the cached results."""
+        return self._generation
+
+    def get(self, key: tuple):
+        """
+        Look up ``key`` without computing it, for callers that compute results
+        themselves (streamed searches). Counts a hit or a miss.
+
+        Returns:
+            list: The cached result, or None.
+        """
+        self._check_generation()
+        result = self._get(key)
+        if result is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return result
+
+    def put(self, key: tuple, result: list, generation: int) -> None:
+        """
+        Cache a result computed by the caller.
+
+        Args:
+            key (tuple): Hashable key of the request.
+            result (list): The search result.
+            generation (int): ``generation`` when the computation started; the result
+                is dropped if an ingest changed it since.
+        """
+        self._check_generation()
+        if generation == self._generation:
+            self._put(key, result)
+
+    async def get_or_compute(self, key: tuple, compute) -> list:
+        """
+        Return the cached result of ``key``, or compute and cache it.
+
+        Args:
+            key (tuple): Hashable key of the request.
+            compute (Callable[[], Awaitable[list]]): Computes the result on a miss.
+
+        Returns:
+            list: The search result. Callers must not modify it, it is shared.
+        """
+        self._check_generation()
+        result = self._get(key)
+        if result is not None:
+            self.hits += 1
+            return result
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                if not inflight.cancelled():
+                    raise
+                # request ที่กำลังคำนวณถูกยกเลิก (เช่น client ปิดการเชื่อมต่อ) จึงคำนวณเอง
+
+        self.misses += 1
+        generation = self._generation
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await compute()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # ไม่มีใครรอก็ไม่ต้องเตือนว่า exception ไม่ถูกอ่าน
+            future.exception()
+            raise
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+        future.set_result(result)
+        if generation == self._generation:
+            self._put(key, result)
+        return result
+
+    def clear(self) -> None:
+        """Remove every cached result."""
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self) -> dict:
+        """
+        Returns:
+            dict: Hit/miss counters and current size of the cache.
+        """
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "hit_rate": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+            "generation": self._generation,
+        }
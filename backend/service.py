@@ -1,14 +1,28 @@
+import json
+import time
+import asyncio
 import uvicorn
+from contextlib import asynccontextmanager, AsyncExitStack
 from fastapi import Query
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from typing import List, Optional
 from fastapi.middleware.cors import CORSMiddleware
-from sentence_transformers import SentenceTransformer
+from qdrant_client import QdrantClient, AsyncQdrantClient
 
-from config.config import COLLECTION_NAME
+from config.config import COLLECTION_NAME, QDRANT_HOST, HYBRID_WEIGHT, HYBRID_DEPTH, HYBRID_MAX_DEPTH, SEARCH_MAX_TOP, SEARCH_MAX_CONCURRENCY, SEARCH_MAX_QUEUE, FACULTY_CACHE_MAX_AGE, FACULTY_REFRESH_MIN_AGE, SERVICE_WARMUP
 from backend.nerual_search import NeuralSearcher
 from backend.text_search import TextSearcher
+from backend.hybrid_search import HybridSearcher
+from backend.document_store import DocumentStore
+from backend.result_cache import SearchResultCache
+from backend.utils import normalize_query, normalize_faculty
+from backend.encoder import load_encoder
 from backend.extract_minio import MinioExtract
+from backend.faculty_index import FacultyIndex
+from backend.concurrency import AdmissionLimiter, QueueFullError
+from backend.metrics import REGISTRY, MetricsMiddleware, SEARCHES, SEARCH_RESULTS, EMPTY_SEARCHES, SEARCH_ERRORS, stage
 from config.logging_config.modern_log import LoggingConfig
 
 # ---------------------------------------------------------------------------- #
@@ -17,9 +31,100 @@ from config.logging_config.modern_log import LoggingConfig
 logger = LoggingConfig(level="INFO").get_logger()
 # ---------------------------------------------------------------------------- #
 
-model = SentenceTransformer("BAAI/bge-m3", device="cuda") # cuda or cpu
+class ServiceNotReady(RuntimeError):
+    """Raised by endpoints that need the model before it has been loaded."""
 
-app = FastAPI()
+
+async def load_searchers(app: FastAPI) -> None:
+    """
+    Load the model and build the searchers in the background, then mark the
+    service ready.
+
+    Anything a harness already put on ``app.state`` (a model, a searcher, a
+    client) is used as is, so tests and benchmarks can swap in stand-ins.
+    """
+    state = app.state
+    try:
+        if getattr(state, "model", None) is None:
+            # โหลดโมเดลใน thread เพื่อให้ /healthz ตอบได้ระหว่างรอ
+            state.model = await asyncio.to_thread(load_encoder)
+        if getattr(state, "neural_searcher", None) is None:
+            state.neural_searcher = NeuralSearcher(
+                collection_name=COLLECTION_NAME,
+                model=state.model,
+                qdrant_client=state.qdrant_client,
+                async_client=state.async_qdrant_client,
+            )
+        if getattr(state, "hybrid_searcher", None) is None:
+            state.hybrid_searcher = HybridSearcher(
+                neural_searcher=state.neural_searcher,
+                text_searcher=state.text_searcher,
+            )
+        if SERVICE_WARMUP:
+            await asyncio.to_thread(state.model.encode, "warm up", show_progress_bar=False)
+        state.ready = True
+        logger.info("Service is ready")
+    except Exception as e:
+        state.startup_error = f"{type(e).__name__}: {e}"
+        logger.exception("Service failed to start")
+
+
+def cache_metrics(prefix: str, stats: dict) -> list:
+    """
+    Convert the ``stats()`` of a cache into metrics for ``REGISTRY.register_callback``.
+    """
+    metrics = [
+        (f"{prefix}_hits_total", "counter", "Lookups answered from the cache.", stats["hits"]),
+        (f"{prefix}_misses_total", "counter", "Lookups that had to be computed.", stats["misses"]),
+        (f"{prefix}_evictions_total", "counter", "Entries evicted by size, count or TTL.", stats["evictions"]),
+        (f"{prefix}_entries", "gauge", "Entries in the cache.", stats["entries"]),
+        (f"{prefix}_bytes", "gauge", "Memory used by the cached values.", stats["bytes"]),
+    ]
+    if "coalesced" in stats:
+        metrics.append((f"{prefix}_coalesced_total", "counter", "Lookups that waited for an identical request in flight.", stats["coalesced"]))
+    return metrics
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    state = app.state
+    defaults = {
+        "qdrant_client": lambda: QdrantClient(QDRANT_HOST),
+        "async_qdrant_client": lambda: AsyncQdrantClient(QDRANT_HOST),
+        "text_searcher": TextSearcher,
+        "document_store": DocumentStore,
+        "result_cache": SearchResultCache,
+        "faculty_index": lambda: FacultyIndex(MinioExtract()),
+        "search_limiter": lambda: AdmissionLimiter(max_concurrency=SEARCH_MAX_CONCURRENCY, max_queue=SEARCH_MAX_QUEUE),
+    }
+    for name, factory in defaults.items():
+        if getattr(state, name, None) is None:
+            setattr(state, name, factory())
+    state.ready = False
+    state.startup_error = None
+    state.faculty_index.start()
+    REGISTRY.register_callback("result_cache", lambda: cache_metrics("search_result_cache", state.result_cache.stats()))
+    REGISTRY.register_callback("query_cache", lambda: cache_metrics(
+        "query_embedding_cache", state.neural_searcher.cache.stats()) if getattr(state, "neural_searcher", None) else [])
+    loader = asyncio.create_task(load_searchers(app))
+    try:
+        yield
+    finally:
+        loader.cancel()
+        state.faculty_index.stop()
+        neural_searcher = getattr(state, "neural_searcher", None)
+        if neural_searcher is not None:
+            neural_searcher.executor.shutdown()
+        hybrid_searcher = getattr(state, "hybrid_searcher", None)
+        if hybrid_searcher is not None:
+            hybrid_searcher.executor.shutdown(wait=False)
+        state.qdrant_client.close()
+        await state.async_qdrant_client.close()
+
+
+app = FastAPI(lifespan=lifespan)
+
+app.add_middleware(MetricsMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
@@ -30,33 +135,219 @@ app.add_middleware(
 )
 
 
-neural_searcher = NeuralSearcher(
-    collection_name=COLLECTION_NAME,
-    model=model,
-)
-text_searcher = TextSearcher(
-    collection_name=COLLECTION_NAME,
-)
+def ready_state(request: Request) -> object:
+    """
+    Returns:
+        State: ``app.state`` once the model and searchers are loaded.
+
+    Raises:
+        ServiceNotReady: If they are still loading or failed to load.
+    """
+    state = request.app.state
+    if not getattr(state, "ready", False):
+        raise ServiceNotReady(state.startup_error or "model is loading")
+    return state
+
+@app.exception_handler(ServiceNotReady)
+async def not_ready_handler(request: Request, exc: ServiceNotReady):
+    return JSONResponse(status_code=503, content={"detail": f"Service not ready: {exc}"}, headers={"Retry-After": "5"})
 
+@app.get("/healthz")
+def healthz():
+    return {"status": "ok"}
 
-faculty_searcher = MinioExtract()
+@app.get("/readyz")
+def readyz(request: Request):
+    state = request.app.state
+    if getattr(state, "ready", False):
+        return {"status": "ready"}
+    status = "failed" if getattr(state, "startup_error", None) else "starting"
+    return JSONResponse(status_code=503, content={"status": status, "error": getattr(state, "startup_error", None)})
+
+@app.exception_handler(QueueFullError)
+async def queue_full_handler(request: Request, exc: QueueFullError):
+    logger.warning(f"Rejected {request.url.path}: {exc}")
+    return JSONResponse(status_code=503, content={"detail": "Server busy, try again"}, headers={"Retry-After": "1"})
+
+@app.get("/metrics")
+def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
 
 @app.get("/api/faculties")
-async def get_faculties():
-    faculties = faculty_searcher.list_objects()  # หรือ faculty_searcher.get_faculties() ถ้ามี method แยก
-    return {"faculties": faculties}
+def get_faculties(request: Request, response: Response, counts: bool = False):
+    snapshot = request.app.state.faculty_index.snapshot()
+    headers = {
+        "ETag": snapshot["etag"],
+        "Cache-Control": f"public, max-age={FACULTY_CACHE_MAX_AGE}",
+    }
+    if request.headers.get("if-none-match") == snapshot["etag"]:
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    if counts:
+        return {"faculties": snapshot["faculties"], "counts": snapshot["counts"], "bucket": snapshot["bucket"]}
+    return {"faculties": snapshot["faculties"]}
+
+@app.post("/api/faculties/refresh")
+def refresh_faculties(request: Request):
+    # endpoint นี้ไม่มี auth จึงไม่ list ทั้ง bucket ซ้ำถ้าเพิ่ง refresh ไป
+    faculty_index = request.app.state.faculty_index
+    snapshot = faculty_index.refresh(min_age=FACULTY_REFRESH_MIN_AGE)
+    return {"faculties": len(snapshot["faculties"]), "etag": snapshot["etag"], "age": faculty_index.age()}
+
+@app.get("/api/stats")
+async def get_stats(request: Request):
+    state = ready_state(request)
+    return {
+        "query_cache": state.neural_searcher.cache.stats(),
+        "result_cache": state.result_cache.stats(),
+        "encoder": state.neural_searcher.batcher.stats(),
+        "encode_pending": state.neural_searcher.executor.pending,
+        "search_waiting": state.search_limiter.waiting,
+    }
 
 @app.get("/api/search")
 async def read_item(
+    request: Request,
     q: str,
     neural: bool = True,
     location: Optional[List[str]] = Query(default=None),
-    top: int = 10
+    top: int = Query(default=10, ge=1, le=SEARCH_MAX_TOP),
+    mode: Optional[str] = Query(default=None, pattern="^(neural|text|hybrid)$"),
+    weight: float = Query(default=HYBRID_WEIGHT, ge=0, le=1),
+    depth: int = Query(default=HYBRID_DEPTH, ge=1, le=HYBRID_MAX_DEPTH),
+    dedupe: bool = True,
+    stream: bool = False,
 ):
-    return {
-        "result": neural_searcher.search(query=q, location=location, top=top)
-        if neural else text_searcher.search(query=q, location=location, top=top)
-    }
+    # mode มาก่อน neural เพื่อให้ frontend เดิมที่ส่ง neural=true/false ยังใช้ได้
+    mode = mode or ("neural" if neural else "text")
+    SEARCHES.inc(mode)
+    try:
+        if stream:
+            return await stream_search(request, q, mode, location, top, weight, depth, dedupe)
+        result = await search(request, q, mode, location, top, weight, depth, dedupe)
+    except Exception as e:
+        SEARCH_ERRORS.inc(mode, type(e).__name__)
+        raise
+    SEARCH_RESULTS.inc(mode, amount=len(result))
+    if not result:
+        EMPTY_SEARCHES.inc(mode)
+    with stage("serialize"):
+        return JSONResponse({"result": result})
+
+def search_key(q: str, mode: str, location: list, top: int, weight: float, depth: int, dedupe: bool) -> tuple:
+    """
+    Returns:
+        tuple: The normalized locations in request order, the same locations sorted
+        (None if there are none), and the result cache key of the search.
+    """
+    with stage("normalize"):
+        order = list(dict.fromkeys(normalize_faculty(loc) for loc in location)) if location else []
+        locations = sorted(order) or None
+        key = (mode, normalize_query(q), tuple(locations or ()), top)
+        if mode == "hybrid":
+            key += (weight, depth, dedupe)
+    return order, locations, key
+
+async def search(request: Request, q: str, mode: str, location: list, top: int, weight: float, depth: int, dedupe: bool) -> list:
+    state = request.app.state if mode == "text" else ready_state(request)
+    order, locations, key = search_key(q, mode, location, top, weight, depth, dedupe)
+
+    async def compute():
+        async with state.search_limiter.slot():
+            if mode == "hybrid":
+                return await state.hybrid_searcher.asearch(query=q, location=locations, top=top, weight=weight, depth=depth, dedupe=dedupe)
+            elif mode == "neural":
+                return await state.neural_searcher.asearch(query=q, location=locations, top=top)
+            return await state.text_searcher.asearch(query=q, location=locations, top=top)
+
+    result = await state.result_cache.get_or_compute(key, compute)
+    if len(order) > 1 and order != locations:
+        # cache เก็บผลตาม location ที่เรียงแล้ว จัดกลุ่มกลับตามลำดับที่ request ส่งมา
+        rank = {loc: i for i, loc in enumerate(order)}
+        result = sorted(result, key=lambda hit: rank.get(hit["payload"].get("faculty"), len(rank)))
+    # ผลลัพธ์มีแค่ doc_id กับหน้า ต่อ metadata ของเอกสารตอนส่งกลับ
+    with stage("join"):
+        return state.document_store.join(result)
+
+async def stream_search(request: Request, q: str, mode: str, location: list, top: int, weight: float, depth: int, dedupe: bool) -> StreamingResponse:
+    """
+    Search and stream the results as NDJSON (``stream=true``): one line per
+    location as soon as its hits are ready, in the order the locations finish,
+    then a summary line::
+
+        {"location": "<faculty>", "result": [...]}
+        {"summary": {"mode": "neural", "locations": 2, "results": 10, "cached": false, "seconds": 0.12}}
+
+    ``location`` is null for a search without locations. A failure after the
+    response has started is sent as an ``{"error": "..."}`` line instead of the
+    summary. Results are cached like other searches, but identical streamed
+    requests in flight are not coalesced.
+    """
+    started = time.perf_counter()
+    state = request.app.state if mode == "text" else ready_state(request)
+    order, locations, key = search_key(q, mode, location, top, weight, depth, dedupe)
+    cached = state.result_cache.get(key)
+    slot = AsyncExitStack()
+    if cached is None:
+        # จอง slot ก่อนเริ่มส่ง response เพื่อให้ยังตอบ 503 ได้เมื่อคิวเต็ม
+        await slot.enter_async_context(state.search_limiter.slot())
+        generation = state.result_cache.generation
+
+    async def from_cache():
+        if not order:
+            yield None, cached
+        for loc in order:
+            yield loc, [hit for hit in cached if hit["payload"].get("faculty") == loc]
+
+    async def from_searcher():
+        if mode == "hybrid":
+            groups = state.hybrid_searcher.astream(query=q, location=locations, top=top, weight=weight, depth=depth, dedupe=dedupe)
+        elif mode == "neural":
+            groups = state.neural_searcher.astream(query=q, location=locations, top=top)
+        else:
+            groups = state.text_searcher.astream(query=q, location=locations, top=top)
+        results = {}
+        async for loc, hits in groups:
+            results[loc] = hits
+            yield loc, hits
+        state.result_cache.put(key, [hit for loc in locations or [None] for hit in results.get(loc, [])], generation)
+
+    def line(record: dict) -> str:
+        return json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+    async def records():
+        total = 0
+        try:
+            async for loc, hits in (from_cache() if cached is not None else from_searcher()):
+                total += len(hits)
+                with stage("join"):
+                    hits = state.document_store.join(hits)
+                with stage("serialize"):
+                    yield line({"location": loc, "result": hits})
+            SEARCH_RESULTS.inc(mode, amount=total)
+            if not total:
+                EMPTY_SEARCHES.inc(mode)
+            yield line({"summary": {
+                "mode": mode,
+                "locations": len(order),
+                "results": total,
+                "cached": cached is not None,
+                "seconds": time.perf_counter() - started,
+            }})
+        except Exception as e:
+            SEARCH_ERRORS.inc(mode, type(e).__name__)
+            logger.exception(f"Streamed search failed: {q!r}")
+            yield line({"error": f"{type(e).__name__}: {e}"})
+        finally:
+            await slot.aclose()
+
+    # background ปล่อย slot ด้วย เผื่อ client ปิดการเชื่อมต่อก่อน generator จะได้เริ่มทำงาน
+    return StreamingResponse(
+        records(),
+        media_type="application/x-ndjson",
+        headers={"X-Accel-Buffering": "no"},
+        background=BackgroundTask(slot.aclose),
+    )
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
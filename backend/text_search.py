@@ -1,86 +1,108 @@
-from qdrant_client import QdrantClient
-from qdrant_client.models import Filter, FieldCondition, MatchText, MatchAny
+import os
+import asyncio
+import threading
 
-from config.config import COLLECTION_NAME
+from backend.lexical_index import LexicalIndex
+from backend.metrics import stage
+from config.config import LEXICAL_INDEX_DIR, SEARCH_PAYLOAD_FIELDS
 
 class TextSearcher:
-    def __init__(self, collection_name: str, qdrant_host: str = "http://localhost:6333"):
+    def __init__(self, index_dir: str = LEXICAL_INDEX_DIR, payload_fields: list = SEARCH_PAYLOAD_FIELDS):
         """
         Args:
-            collection_name (str): The name of the collection to search in.
-            qdrant_host (str, optional): The address of the Qdrant server. Defaults to "http://localhost:6333".
+            index_dir (str, optional): The directory of the lexical index built by
+                ``backend/lexical_index.py``. Defaults to LEXICAL_INDEX_DIR.
+            payload_fields (list, optional): Page fields returned with each hit. Defaults to SEARCH_PAYLOAD_FIELDS.
+
+        The index is memory-mapped on the first search, so the service starts
+        even before the index has been built. It is loaded again when
+        ``LexicalIndex.build`` swaps a new index into ``index_dir``.
         """
-        self.collection_name = collection_name
-        self.qdrant_client = QdrantClient(qdrant_host)
+        self.index_dir = index_dir
+        self.payload_fields = payload_fields
+        self._index = None
+        self._version = None
+        self._lock = threading.Lock()
+
+    def _index_version(self) -> tuple:
+        try:
+            stat = os.stat(os.path.join(self.index_dir, "meta.json"))
+        except OSError:
+            return None
+        # build เขียน meta.json ใหม่ในโฟลเดอร์ใหม่ทุกครั้ง inode หรือ mtime จึงเปลี่ยนเสมอ
+        return stat.st_ino, stat.st_mtime_ns
 
+    @property
+    def index(self) -> LexicalIndex:
+        version = self._index_version()
+        if self._index is None or (version is not None and version != self._version):
+            with self._lock:
+                if self._index is None or (version is not None and version != self._version):
+                    self._index = LexicalIndex(self.index_dir)
+                    self._version = version
+        return self._index
 
     def search(self, query: str, location: list = None, top: int = 5) -> list:
         """
-        Search for the most similar items to the given text in the collection.
+        Search for the pages that best match the given text, ranked with BM25.
         If location is provided, return top-N results per location.
+
+        Args:
+            query (str): The text to search for.
+            location (list, optional): List of location strings for filtering.
+            top (int, optional): The number of results to return per location. Defaults to 5.
+
+        Returns:
+            list: A list of payloads (dictionaries) with the fields of ``payload_fields``
+            and their BM25 scores.
         """
-        all_payloads = []
+        index = self.index
+        with stage("bm25"):
+            hits = index.search(query, location=location, top=top)
+        return self.collect(index, hits)
 
-        if location:
-            for loc in location:
-                scroll_filter = Filter(
-                    must=[
-                        FieldCondition(
-                            key="content",
-                            match=MatchText(text=query),
-                        ),
-                        FieldCondition(
-                            key="location",
-                            match=MatchText(text=loc),
-                        )
-                    ]
-                )
+    def collect(self, index: LexicalIndex, hits: list) -> list:
+        """
+        Read the pages of ``(doc, score)`` hits and keep the fields of ``payload_fields``.
+        """
+        results = []
+        with stage("bm25_documents"):
+            for doc, score in hits:
+                page = index.document(doc)
+                payload = {field: page[field] for field in self.payload_fields if field in page}
+                results.append({"payload": payload, "score": score})
+        return results
 
-                search_result = self.qdrant_client.scroll(
-                    collection_name=self.collection_name,
-                    scroll_filter=scroll_filter,
-                    with_payload=True,
-                    with_vectors=False,
-                    limit=top
-                )
-                payloads = [
-                    {"payload": hit.payload, "score": "N/A"}
-                    for hit in search_result[0]
-                ]
-                all_payloads.extend(payloads)
-        else:
-            scroll_filter = Filter(
-                must=[
-                    FieldCondition(
-                        key="content",
-                        match=MatchText(text=query),
-                    )
-                ]
-            )
+    async def asearch(self, query: str, location: list = None, top: int = 5) -> list:
+        """
+        Non-blocking version of ``search``; scoring runs in a worker thread.
+        """
+        return await asyncio.to_thread(self.search, query=query, location=location, top=top)
+
+    async def astream(self, query: str, location: list = None, top: int = 5):
+        """
+        Same as ``asearch``, but yields the hits of each location separately.
+        The query is scored once for all locations, then the top pages of each
+        location are read and yielded in turn.
+
+        Yields:
+            tuple: ``(location, hits)``; ``location`` is None for a search without locations.
+        """
+        index = await asyncio.to_thread(lambda: self.index)
+        with stage("bm25"):
+            scores = await asyncio.to_thread(index.scores, query)
 
-            search_result = self.qdrant_client.scroll(
-                collection_name=self.collection_name,
-                scroll_filter=scroll_filter,
-                with_payload=True,
-                with_vectors=False,
-                limit=top
-            )
-            all_payloads = [
-                {"payload": hit.payload, "score": "N/A"}
-                for hit in search_result[0]
-            ]
+        def top_in(loc):
+            hits = index.search(query, location=[loc] if loc is not None else None, top=top, scores=scores)
+            return self.collect(index, hits)
 
-        return all_payloads
+        for loc in location or [None]:
+            yield loc, await asyncio.to_thread(top_in, loc)
 
 if __name__ == "__main__":
-    collection_name = COLLECTION_NAME
-    qdrant_host = "http://localhost:6333"
-    searcher = TextSearcher(
-        collection_name=collection_name,
-        qdrant_host=qdrant_host
-    )
+    searcher = TextSearcher()
     location = "2. งานหลักสูตรนานาชาติและหลักสูตรแนวใหม่/คณะแพทยศาสตร์/1.มคอ2แพทยศาสตรบัณฑิตปรับปรุง2563(ไทย)25พ.ย..pdf"
     location = [location.split("/")[1]]
     file_name = searcher.search(query="อาชีพ", location=location, top=10)
     for i in file_name:
-        print(i['payload']['file_name'])
+        print(i['payload']['doc_id'], i['payload']['page'])
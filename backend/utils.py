@@ -0,0 +1,112 @@
+import hashlib
+import unicodedata
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalize a search query so that equivalent strings share one cache key.
+
+    Thai text typed on different keyboards may arrive in different Unicode
+    normalization forms, and the frontend often sends trailing or repeated
+    spaces. The query is converted to NFC and its whitespace is collapsed.
+
+    Args:
+        query (str): Raw query string from the request.
+
+    Returns:
+        str: Normalized query string.
+    """
+    return " ".join(unicodedata.normalize("NFC", query).split())
+
+
+def model_identity(model: object) -> str:
+    """
+    Build a key that identifies a loaded embedding model.
+
+    The key combines the model name (when the model exposes one) with the
+    identity of the loaded object, so swapping the model instance always
+    produces a different key.
+
+    Args:
+        model (object): A sentence transformer model (or compatible encoder).
+
+    Returns:
+        str: A string identifying the model instance.
+    """
+    key = getattr(model, "model_key", None)
+    if key:
+        return key
+    card = getattr(model, "model_card_data", None)
+    name = getattr(card, "base_model", None) or type(model).__name__
+    return f"{name}@{id(model):x}"
+
+
+def model_version(model: object) -> str:
+    """
+    Build a key that names a model and its version, the same in every process.
+
+    Unlike ``model_identity`` the key does not depend on the loaded object, so it
+    can address vectors stored on disk by an earlier run.
+
+    Args:
+        model (object): A sentence transformer model (or compatible encoder).
+
+    Returns:
+        str: The ``model_key`` of the model if it has one, otherwise its base model
+        name and revision.
+    """
+    key = getattr(model, "model_key", None)
+    if key:
+        return key
+    card = getattr(model, "model_card_data", None)
+    name = getattr(card, "base_model", None) or type(model).__name__
+    revision = getattr(card, "base_model_revision", None)
+    return f"{name}@{revision}" if revision else name
+
+
+def faculty_of(location: str) -> str:
+    """
+    Extract the normalized faculty name from an object location.
+
+    Locations follow the bucket layout ``<scope>/<faculty>/.../<file>.pdf``.
+    The name is normalized with ``normalize_faculty``, so the same faculty
+    always produces the same keyword for payload filters.
+
+    Args:
+        location (str): Object name of the document in the bucket.
+
+    Returns:
+        str: The faculty part of the location, or an empty string if there is none.
+    """
+    parts = location.split("/")
+    return normalize_faculty(parts[1]) if len(parts) > 1 else ""
+
+
+def normalize_faculty(name: str) -> str:
+    """
+    Normalize a faculty name (NFC, surrounding whitespace removed).
+
+    Args:
+        name (str): Faculty name from a location or a request.
+
+    Returns:
+        str: The normalized faculty name.
+    """
+    return unicodedata.normalize("NFC", name).strip()
+
+
+
+def document_id(location: str) -> str:
+    """
+    Compact id of a document, derived from its object location.
+
+    Pages and search results refer to their document by this id; the full
+    metadata is stored once per document (see ``DocumentStore``).
+
+    Args:
+        location (str): Object name of the document in the bucket.
+
+    Returns:
+        str: The first 16 hex digits of the SHA-1 of the location.
+    """
+    return hashlib.sha1(location.encode("utf-8")).hexdigest()[:16]
@@ -0,0 +1,82 @@
+"""
+Parity, query latency and ingest throughput of the encoder backends of
+``backend.encoder.load_encoder``.
+
+Every backend is compared with the reference torch model: the cosine similarity
+of the embeddings of the same texts must stay above ``--min-cosine``, otherwise
+the script exits with status 1. Query latency is measured by encoding single
+queries, ingest throughput by encoding pages from the extracted JSONL file in
+batches of ENCODE_BATCH_SIZE.
+
+    python benchmarks/encoders.py --backends torch onnx int8 --threads 8 --output tmp/encoders.json
+"""
+import sys
+import json
+import time
+import argparse
+from itertools import islice
+
+import numpy as np
+
+from backend.encoder import BACKENDS, PARITY_TEXTS, load_encoder, check_parity
+from config.config import FILE_EXTRACT, ENCODE_BATCH_SIZE, ENCODER_DEVICE
+
+
+def load_pages(pages: int) -> list:
+    try:
+        with open(FILE_EXTRACT, encoding="utf-8") as f:
+            return [json.loads(line)["content"] for line in islice(f, pages)]
+    except OSError:
+        # ยังไม่ได้ extract ข้อมูล ใช้ข้อความตัวอย่างแทน
+        return [" ".join(PARITY_TEXTS)] * pages
+
+
+def run(backends: list, device: str, threads: int, queries: int, pages: int, min_cosine: float) -> list:
+    texts = load_pages(pages)
+    reference = load_encoder(backend="torch", device=device, threads=threads)
+
+    results = []
+    for backend in backends:
+        model = reference if backend == "torch" else load_encoder(backend=backend, device=device, threads=threads)
+        parity = check_parity(model, reference)
+        model.encode(PARITY_TEXTS[0])
+
+        latencies = []
+        for i in range(queries):
+            started = time.perf_counter()
+            model.encode(PARITY_TEXTS[i % len(PARITY_TEXTS)], show_progress_bar=False)
+            latencies.append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        model.encode(texts, batch_size=ENCODE_BATCH_SIZE, show_progress_bar=False)
+        elapsed = time.perf_counter() - started
+
+        results.append({
+            "backend": backend,
+            "threads": threads,
+            **parity,
+            "parity_ok": parity["min_cosine"] >= min_cosine,
+            "query_p50_ms": float(np.percentile(latencies, 50)),
+            "query_p95_ms": float(np.percentile(latencies, 95)),
+            "ingest_vectors_per_s": len(texts) / elapsed,
+        })
+        print(json.dumps(results[-1], ensure_ascii=False))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument("--device", default=ENCODER_DEVICE, help="device of the torch backend (auto, cuda or cpu)")
+    parser.add_argument("--threads", type=int, default=0, help="CPU threads, 0 keeps the library default")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--pages", type=int, default=256)
+    parser.add_argument("--min-cosine", type=float, default=0.99)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    results = run(args.backends, args.device, args.threads, args.queries, args.pages, args.min_cosine)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    sys.exit(0 if all(result["parity_ok"] for result in results) else 1)
@@ -0,0 +1,308 @@
+"""
+Offline stand-ins shared by the benchmarks: a deterministic stub encoder, a
+synthetic Thai/English PDF corpus, and local replacements of the MinIO bucket
+and the Qdrant server. Nothing here touches the network.
+"""
+import io
+import os
+import json
+import hashlib
+import warnings
+import subprocess
+from types import SimpleNamespace
+
+import numpy as np
+from qdrant_client import QdrantClient, AsyncQdrantClient
+
+from backend.extract_minio import BucketStats, extract_pages
+from backend.qdrant_upload import VectorUploader
+from backend.lexical_index import LexicalIndex, tokenize
+from backend.embedding_store import EmbeddingStore
+from backend.utils import document_id, model_version
+from config.config import ROOT_DIR, VECTOR_SIZE
+
+# local mode เตือนทุกครั้งที่สร้าง payload index ซึ่งไม่มีผลกับ benchmark ที่ใช้ stand-in เหล่านี้
+warnings.filterwarnings("ignore", message=".*[Pp]ayload index.*", category=UserWarning)
+
+THAI_WORDS = [
+    "หลักสูตร", "วิทยาศาสตรบัณฑิต", "สาขาวิชา", "อาชีพ", "ผู้ดูแลระบบ", "นักวิเคราะห์ข้อมูล",
+    "โครงสร้าง", "หน่วยกิต", "ผลลัพธ์การเรียนรู้", "คุณสมบัติ", "ผู้เข้าศึกษา", "อาจารย์",
+    "การประเมิน", "ภาคการศึกษา", "วิชาเลือก", "วิชาบังคับ", "ปรับปรุง", "มาตรฐาน",
+    "การวิจัย", "ฝึกงาน", "สหกิจศึกษา", "เทคโนโลยี", "ความยั่งยืน", "แพทยศาสตร์",
+    "นิติศาสตร์", "วิศวกรรม", "บัญชี", "การตลาด", "ภาษาอังกฤษ", "คณิตศาสตร์",
+]
+ENGLISH_WORDS = [
+    "curriculum", "bachelor", "science", "program", "learning", "outcome", "PLO", "credit",
+    "semester", "elective", "course", "assessment", "research", "internship", "career",
+    "data", "system", "engineering", "technology", "sustainable", "development", "law",
+    "medicine", "accounting", "marketing", "computer", "analysis", "standard", "revised", "2566",
+]
+FACULTIES = [
+    "คณะวิทยาศาสตร์และเทคโนโลยี", "คณะแพทยศาสตร์", "คณะนิติศาสตร์", "คณะวิศวกรรมศาสตร์",
+    "คณะพาณิชยศาสตร์และการบัญชี", "คณะศิลปศาสตร์", "คณะสถาปัตยกรรมศาสตร์และการผังเมือง", "คณะเศรษฐศาสตร์",
+]
+
+
+class StubEncoder:
+    def __init__(self, dim: int = VECTOR_SIZE, max_seq_length: int = 512):
+        """
+        Deterministic encoder with the interface of a sentence transformer.
+
+        Every token of ``backend.lexical_index.tokenize`` is hashed to a few
+        signed dimensions and the sum is normalized, so texts that share words
+        get similar vectors and results are the same on every machine. It costs a
+        fraction of a real model, so benchmarks with it measure the rest of the
+        pipeline.
+
+        Args:
+            dim (int, optional): Vector size. Defaults to VECTOR_SIZE.
+            max_seq_length (int, optional): Reported to the chunker like a real model. Defaults to 512.
+        """
+        self.dim = dim
+        self.max_seq_length = max_seq_length
+        self.model_key = f"stub-hash-{dim}"
+
+    def _encode_one(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for token in tokenize(text):
+            digest = hashlib.blake2b(token.encode("utf-8"), digest_size=16).digest()
+            for i in range(0, 16, 4):
+                value = int.from_bytes(digest[i:i + 4], "little")
+                vector[value % self.dim] += 1.0 if value & 0x80000000 else -1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def encode(self, sentences, batch_size: int = 32, show_progress_bar: bool = False, normalize_embeddings: bool = False, **kwargs) -> np.ndarray:
+        if isinstance(sentences, str):
+            return self._encode_one(sentences)
+        if not len(sentences):
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.stack([self._encode_one(text) for text in sentences])
+
+
+def _to_unicode_cmap() -> bytes:
+    # map CID = code point ของ Basic Latin และภาษาไทย เพื่อให้ PdfReader ถอดข้อความกลับได้โดยไม่ต้องฝังฟอนต์
+    blocks = (0x00, 0x0E)
+    lines = [
+        "/CIDInit /ProcSet findresource begin", "12 dict begin", "begincmap",
+        "/CIDSystemInfo << /Registry (Adobe) /Ordering (UCS) /Supplement 0 >> def",
+        "/CMapName /Adobe-Identity-UCS def", "/CMapType 2 def",
+        "1 begincodespacerange", "<0000> <FFFF>", "endcodespacerange",
+        f"{len(blocks)} beginbfrange",
+        *(f"<{block:02X}00> <{block:02X}FF> <{block:02X}00>" for block in blocks),
+        "endbfrange", "endcmap", "CMapName currentdict /CMap defineresource pop", "end", "end",
+    ]
+    return "\n".join(lines).encode("ascii")
+
+
+def make_pdf(pages: list) -> bytes:
+    """
+    Write a minimal PDF whose text (Thai or Latin) is extractable with PyPDF2.
+
+    Args:
+        pages (list): One list of text lines per page.
+
+    Returns:
+        bytes: The PDF file.
+    """
+    objects = [None, None]
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    def stream(data: bytes) -> bytes:
+        return b"<< /Length %d >>\nstream\n" % len(data) + data + b"\nendstream"
+
+    to_unicode = add(stream(_to_unicode_cmap()))
+    descriptor = add(b"<< /Type /FontDescriptor /FontName /BenchSans /Flags 32 /FontBBox [0 -200 1000 900] /ItalicAngle 0 /Ascent 900 /Descent -200 /CapHeight 700 /StemV 80 >>")
+    cid_font = add(b"<< /Type /Font /Subtype /CIDFontType2 /BaseFont /BenchSans /CIDSystemInfo << /Registry (Adobe) /Ordering (Identity) /Supplement 0 >> /FontDescriptor %d 0 R /DW 500 >>" % descriptor)
+    font = add(b"<< /Type /Font /Subtype /Type0 /BaseFont /BenchSans /Encoding /Identity-H /DescendantFonts [%d 0 R] /ToUnicode %d 0 R >>" % (cid_font, to_unicode))
+    kids = []
+    for lines in pages:
+        operations = ["BT", "/F1 10 Tf", "40 800 Td", "14 TL"]
+        operations.extend("<" + "".join(f"{ord(ch):04X}" for ch in line) + "> Tj T*" for line in lines)
+        operations.append("ET")
+        content = add(stream("\n".join(operations).encode("ascii")))
+        kids.append(add(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>" % (font, content)))
+    objects[0] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(b"%d 0 R" % kid for kid in kids), len(kids))
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    out.writelines(b"%010d 00000 n \n" % offset for offset in offsets)
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return out.getvalue()
+
+
+def synthetic_corpus(documents: int, pages: int, words: int = 180, seed: int = 0) -> list:
+    """
+    Generate a reproducible corpus of mixed Thai/English curriculum documents.
+
+    Args:
+        documents (int): Number of documents.
+        pages (int): Pages per document.
+        words (int, optional): Words per page. Defaults to 180.
+        seed (int, optional): Random seed. Defaults to 0.
+
+    Returns:
+        list: ``(metadata, page_lines)`` per document, where metadata has the
+        fields ``MinioExtract.fetch_object`` builds and ``page_lines`` is one list
+        of text lines per page, ready for ``make_pdf``.
+    """
+    rng = np.random.default_rng(seed)
+    vocabulary = THAI_WORDS + ENGLISH_WORDS
+    corpus = []
+    for number in range(documents):
+        faculty = FACULTIES[number % len(FACULTIES)]
+        location = f"2. งานหลักสูตร/{faculty}/หลักสูตร-{number:05d}.pdf"
+        page_lines = []
+        for page in range(pages):
+            chosen = rng.choice(vocabulary, size=words)
+            # คำแรกของหน้าเป็นเลขหน้า เหมือน PDF จริงที่ clean_text ตัดทิ้ง
+            tokens = [str(page + 1), *chosen.tolist()]
+            page_lines.append([" ".join(tokens[i:i + 12]) for i in range(0, len(tokens), 12)])
+        corpus.append(({
+            "doc_id": document_id(location),
+            "file_name": location.split("/")[-1],
+            "location": location,
+            "faculty": faculty,
+            "size": 0,
+            "filetype": "application/pdf",
+        }, page_lines))
+    return corpus
+
+
+def synthetic_queries(count: int, seed: int = 1) -> list:
+    """
+    Returns:
+        list: ``count`` distinct short Thai/English queries drawn from the corpus vocabulary.
+    """
+    rng = np.random.default_rng(seed)
+    vocabulary = THAI_WORDS + ENGLISH_WORDS
+    queries = []
+    while len(queries) < count:
+        query = " ".join(rng.choice(vocabulary, size=int(rng.integers(1, 4))).tolist())
+        if query not in queries:
+            queries.append(query)
+    return queries
+
+
+def zipf_sample(items: list, count: int, exponent: float = 1.1, seed: int = 2) -> list:
+    """
+    Draw ``count`` items with Zipf-like popularity: the i-th item is drawn with a
+    weight of ``1 / (i + 1) ** exponent``, so a few queries repeat often and
+    most are rare, as in a real query log.
+    """
+    rng = np.random.default_rng(seed)
+    weights = 1.0 / np.arange(1, len(items) + 1) ** exponent
+    return [items[i] for i in rng.choice(len(items), size=count, p=weights / weights.sum())]
+
+
+class LocalBucket:
+    def __init__(self, documents: list):
+        """
+        Stand-in for ``MinioExtract`` listing the synthetic corpus, for ``FacultyIndex``.
+
+        Args:
+            documents (list): Document metadata with ``location`` and ``size``.
+        """
+        self.objects = [SimpleNamespace(object_name=document["location"], size=document["size"]) for document in documents]
+
+    def bucket_stats(self, objects: list = None) -> BucketStats:
+        stats = BucketStats()
+        for obj in self.objects if objects is None else objects:
+            stats.add(obj)
+        return stats
+
+
+def prepare_index(workdir: str, model: object, collection_name: str, documents: int, pages: int, words: int = 180, seed: int = 0) -> list:
+    """
+    Build everything the service reads from a synthetic corpus, in ``workdir``:
+    the extracted pages (``extract.jsonl``), the document metadata
+    (``documents.json``), a local-mode Qdrant store (``qdrant/``) with
+    ``collection_name``, and the BM25 index (``lexical/``).
+
+    Returns:
+        list: The metadata of the documents.
+    """
+    corpus = synthetic_corpus(documents, pages, words=words, seed=seed)
+    extracted = []
+    metadata = []
+    for document, page_lines in corpus:
+        pdf_bytes = make_pdf(page_lines)
+        document = {**document, "size": len(pdf_bytes)}
+        extracted.extend(extract_pages(pdf_bytes, document))
+        metadata.append(document)
+
+    json_path = os.path.join(workdir, "extract.jsonl")
+    generation_path = os.path.join(workdir, "index_generation")
+    write_jsonl(json_path, extracted)
+    with open(os.path.join(workdir, "documents.json"), "w", encoding="utf-8") as f:
+        json.dump({document["doc_id"]: document for document in metadata}, f, ensure_ascii=False)
+
+    client = QdrantClient(path=os.path.join(workdir, "qdrant"))
+    try:
+        store = EmbeddingStore(model_version(model), directory=os.path.join(workdir, "embeddings"))
+        VectorUploader(json_path, collection_name, model, qdrant_client=client, embedding_store=store, generation_path=generation_path).upload(full=True)
+    finally:
+        client.close()
+    LexicalIndex.build(json_path, index_dir=os.path.join(workdir, "lexical"), generation_path=generation_path)
+    return metadata
+
+
+def local_clients(workdir: str) -> tuple:
+    """
+    Clients of the local-mode Qdrant store built by ``prepare_index``.
+
+    Returns:
+        tuple: ``(qdrant_client, async_client)``. Only the async client opens the
+        store; the sync client is an empty in-memory one.
+    """
+    # local mode ล็อกโฟลเดอร์ไว้ให้ client เดียว ส่วน client แบบ sync ไม่ได้ใช้ใน asearch และ /api/search
+    return QdrantClient(":memory:"), AsyncQdrantClient(path=os.path.join(workdir, "qdrant"))
+
+
+def write_jsonl(path: str, rows: list) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(row, ensure_ascii=False))
+            f.write("\n")
+
+
+def percentiles(seconds: list) -> dict:
+    """
+    Returns:
+        dict: p50/p95/p99, mean and max of ``seconds`` in milliseconds.
+    """
+    if not seconds:
+        return {"count": 0}
+    ms = np.asarray(seconds, dtype=np.float64) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {
+        "count": len(ms),
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+        "mean_ms": float(ms.mean()),
+        "max_ms": float(ms.max()),
+    }
+
+
+def git_commit() -> str:
+    """
+    Returns:
+        str: The commit of the working tree, with "-dirty" if it has changes, or None outside git.
+    """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return f"{commit}-dirty" if dirty else commit
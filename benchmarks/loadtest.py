@@ -0,0 +1,309 @@
+"""
+Load test of the FastAPI service with the request mix of the web UI.
+
+Every request is either ``GET /api/faculties`` (with ``--faculties-ratio``) or
+``GET /api/search`` with a query, a mode and up to ``--max-locations`` faculties
+taken from ``/api/faculties``. Queries are replayed from a log (``--queries``,
+one query per line, or JSON lines with ``q`` and optionally ``mode`` and
+``location``) or drawn from a synthetic Thai/English distribution where a few
+queries are much more popular than the rest.
+
+Two kinds of load are supported:
+- closed loop (``--concurrency``): N clients each send their next request as soon
+  as the previous one is answered;
+- open loop (``--rate``): requests arrive as a Poisson process at the given rate,
+  whether or not earlier ones were answered. Latency is counted from the
+  scheduled arrival, so a slow server is not hidden by a slower client.
+
+Each level runs for ``--duration`` seconds and adds one point to the
+throughput-vs-latency curve, with p50/p95/p99 latency per endpoint, error
+rates per status code or exception, and the server's ``/api/stats`` afterwards.
+
+By default the app runs in-process (httpx ``ASGITransport``) on local stand-ins:
+the synthetic corpus of ``benchmarks.harness`` in Qdrant's local mode, a local
+bucket listing instead of MinIO, and the stub encoder (or ``--encoder``). The
+load generator shares the event loop with the app, so absolute numbers are
+lower than on a server; compare them across commits. Use ``--url`` to load a
+running service instead:
+
+    python benchmarks/loadtest.py --concurrency 1 4 16 64 --output tmp/load-closed.json
+    python benchmarks/loadtest.py --rate 20 50 100 200 --output tmp/load-open.json
+    python benchmarks/loadtest.py --url http://localhost:8000 --queries tmp/queries.txt --rate 10 20 50
+"""
+import os
+import json
+import time
+import asyncio
+import logging
+import argparse
+import tempfile
+from collections import Counter, defaultdict
+from contextlib import asynccontextmanager
+
+import httpx
+import numpy as np
+
+from backend.encoder import BACKENDS, load_encoder
+from backend.faculty_index import FacultyIndex
+from backend.text_search import TextSearcher
+from backend.document_store import DocumentStore
+from backend.result_cache import SearchResultCache
+from benchmarks.harness import LocalBucket, StubEncoder, prepare_index, local_clients, synthetic_queries, zipf_sample, percentiles, git_commit
+from config.config import COLLECTION_NAME
+
+# httpx log ทุก request ที่ระดับ INFO ซึ่งจะกลายเป็นภาระของ load test เอง
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+
+def load_queries(path: str) -> list:
+    queries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line) if line.startswith("{") else {"q": line}
+            queries.append(entry)
+    return queries
+
+
+class Workload:
+    def __init__(self, queries: list, faculties: list, modes: list, top: int, faculties_ratio: float, max_locations: int, seed: int = 0):
+        """
+        Stream of requests with the mix of the web UI.
+
+        Args:
+            queries (list): ``{"q": ...}`` entries, replayed in order and then from the start.
+                An entry may set its own ``mode`` and ``location``.
+            faculties (list): Faculty names to filter on.
+            modes (list): Search modes, chosen uniformly for entries without one.
+            top (int): Results per location.
+            faculties_ratio (float): Share of ``/api/faculties`` requests.
+            max_locations (int): Maximum faculties per search; each search uses 0 to this many.
+            seed (int, optional): Random seed. Defaults to 0.
+        """
+        self.queries = queries
+        self.faculties = faculties
+        self.modes = modes
+        self.top = top
+        self.faculties_ratio = faculties_ratio
+        self.max_locations = min(max_locations, len(faculties))
+        self.rng = np.random.default_rng(seed)
+        self.position = 0
+
+    def next(self) -> tuple:
+        """
+        Returns:
+            tuple: ``(name, path, params)`` of the next request.
+        """
+        if self.rng.random() < self.faculties_ratio:
+            return "faculties", "/api/faculties", {}
+        entry = self.queries[self.position % len(self.queries)]
+        self.position += 1
+        location = entry.get("location")
+        if location is None:
+            count = int(self.rng.integers(0, self.max_locations + 1))
+            location = [self.faculties[i] for i in self.rng.choice(len(self.faculties), size=count, replace=False)]
+        mode = entry.get("mode") or self.modes[int(self.rng.integers(len(self.modes)))]
+        return f"search:{mode}", "/api/search", {"q": entry["q"], "mode": mode, "top": self.top, "location": location}
+
+
+class Recorder:
+    def __init__(self):
+        """Latencies and errors of the requests of one load level."""
+        self.latencies = defaultdict(list)
+        self.errors = Counter()
+        self.dropped = 0
+
+    def add(self, name: str, seconds: float, error: str = None) -> None:
+        self.latencies[name].append(seconds)
+        if error is not None:
+            self.errors[f"{name} {error}"] += 1
+
+    def summary(self, wall: float) -> dict:
+        requests = sum(len(seconds) for seconds in self.latencies.values())
+        errors = sum(self.errors.values())
+        return {
+            "requests": requests,
+            "seconds": wall,
+            "throughput_rps": requests / wall,
+            "ok_rps": (requests - errors) / wall,
+            "error_rate": errors / requests if requests else 0.0,
+            "errors": dict(self.errors),
+            # open loop เท่านั้น: request ที่ไม่ได้ส่งเพราะมีค้างอยู่เกิน --max-in-flight
+            "dropped": self.dropped,
+            "latency": percentiles([s for seconds in self.latencies.values() for s in seconds]),
+            "endpoints": {name: percentiles(seconds) for name, seconds in sorted(self.latencies.items())},
+        }
+
+
+async def send(client: httpx.AsyncClient, request: tuple, recorder: Recorder, started: float) -> None:
+    name, path, params = request
+    error = None
+    try:
+        response = await client.get(path, params=params)
+        if response.status_code >= 400:
+            error = str(response.status_code)
+    except httpx.HTTPError as e:
+        error = type(e).__name__
+    recorder.add(name, time.perf_counter() - started, error)
+
+
+async def closed_loop(client: httpx.AsyncClient, workload: Workload, concurrency: int, duration: float) -> dict:
+    recorder = Recorder()
+    started = time.perf_counter()
+    deadline = started + duration
+
+    async def user():
+        while time.perf_counter() < deadline:
+            await send(client, workload.next(), recorder, time.perf_counter())
+
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    return {"concurrency": concurrency, **recorder.summary(time.perf_counter() - started)}
+
+
+async def open_loop(client: httpx.AsyncClient, workload: Workload, rate: float, duration: float, max_in_flight: int, seed: int = 0) -> dict:
+    recorder = Recorder()
+    rng = np.random.default_rng(seed)
+    in_flight = set()
+    started = time.perf_counter()
+    arrival = started
+    while True:
+        arrival += rng.exponential(1 / rate)
+        if arrival - started > duration:
+            break
+        delay = arrival - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if len(in_flight) >= max_in_flight:
+            recorder.dropped += 1
+            continue
+        task = asyncio.create_task(send(client, workload.next(), recorder, arrival))
+        in_flight.add(task)
+        task.add_done_callback(in_flight.discard)
+    await asyncio.gather(*in_flight)
+    return {"rate": rate, **recorder.summary(time.perf_counter() - started)}
+
+
+@asynccontextmanager
+async def local_service(encoder: str, documents: int, pages: int, result_cache: bool, timeout: float):
+    """
+    Run ``backend.service.app`` in-process on local stand-ins and yield a client
+    for it once ``/readyz`` answers 200.
+    """
+    from backend.service import app, lifespan
+
+    model = StubEncoder() if encoder == "stub" else load_encoder(backend=encoder)
+    with tempfile.TemporaryDirectory(prefix="dsi324-load-") as workdir:
+        metadata = prepare_index(workdir, model, COLLECTION_NAME, documents, pages)
+        state = app.state
+        state.model = model
+        state.qdrant_client, state.async_qdrant_client = local_clients(workdir)
+        state.text_searcher = TextSearcher(os.path.join(workdir, "lexical"))
+        state.document_store = DocumentStore(os.path.join(workdir, "documents.json"))
+        state.result_cache = SearchResultCache(
+            generation_path=os.path.join(workdir, "index_generation"),
+            **({} if result_cache else {"max_entries": 0}),
+        )
+        state.faculty_index = FacultyIndex(LocalBucket(metadata))
+        async with lifespan(app):
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://loadtest", timeout=timeout) as client:
+                await wait_ready(client, timeout)
+                yield client
+
+
+async def wait_ready(client: httpx.AsyncClient, timeout: float) -> None:
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            response = await client.get("/readyz")
+            if response.status_code == 200:
+                return
+            if response.json().get("status") == "failed":
+                raise RuntimeError(f"The service failed to start: {response.json().get('error')}")
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.1)
+    raise TimeoutError(f"The service was not ready within {timeout}s")
+
+
+async def server_stats(client: httpx.AsyncClient) -> dict:
+    response = await client.get("/api/stats")
+    return response.json() if response.status_code == 200 else None
+
+
+async def run(args: argparse.Namespace) -> dict:
+    if args.url:
+        target = httpx.AsyncClient(base_url=args.url, timeout=args.timeout)
+    else:
+        target = local_service(args.encoder, args.docs, args.pages, not args.no_result_cache, args.timeout)
+
+    async with target as client:
+        if args.url:
+            await wait_ready(client, args.timeout)
+        faculties = (await client.get("/api/faculties")).json()["faculties"]
+        if args.queries:
+            queries = load_queries(args.queries)
+        else:
+            queries = [{"q": q} for q in zipf_sample(synthetic_queries(args.distinct_queries, seed=args.seed + 1), 10000, seed=args.seed + 2)]
+        workload = Workload(queries, faculties, args.modes, args.top, args.faculties_ratio, args.max_locations, seed=args.seed)
+
+        curve = []
+        for concurrency in args.concurrency or []:
+            point = await closed_loop(client, workload, concurrency, args.duration)
+            curve.append({"loop": "closed", **point, "server": await server_stats(client)})
+            print(f"closed concurrency={concurrency}: {point['throughput_rps']:.1f} req/s, p99 {point['latency'].get('p99_ms', 0):.1f} ms, errors {point['error_rate']:.1%}")
+        for rate in args.rate or []:
+            point = await open_loop(client, workload, rate, args.duration, args.max_in_flight, seed=args.seed)
+            curve.append({"loop": "open", **point, "server": await server_stats(client)})
+            print(f"open rate={rate}: {point['throughput_rps']:.1f} req/s, p99 {point['latency'].get('p99_ms', 0):.1f} ms, errors {point['error_rate']:.1%}, dropped {point['dropped']}")
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "target": args.url or "in-process",
+            "encoder": None if args.url else args.encoder,
+            "documents": None if args.url else args.docs,
+            "queries": args.queries or f"synthetic ({args.distinct_queries} distinct)",
+            "modes": args.modes,
+            "faculties_ratio": args.faculties_ratio,
+            "max_locations": args.max_locations,
+            "top": args.top,
+            "duration_s": args.duration,
+            "result_cache": None if args.url else not args.no_result_cache,
+            "seed": args.seed,
+        },
+        "curve": curve,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="load a running service instead of the in-process app")
+    parser.add_argument("--concurrency", type=int, nargs="+", help="closed-loop levels (concurrent clients)")
+    parser.add_argument("--rate", type=float, nargs="+", help="open-loop levels (requests per second)")
+    parser.add_argument("--duration", type=float, default=10, help="seconds per level")
+    parser.add_argument("--max-in-flight", type=int, default=1000, help="open loop: requests in flight before new arrivals are dropped")
+    parser.add_argument("--queries", help="query log to replay")
+    parser.add_argument("--distinct-queries", type=int, default=500, help="size of the synthetic query distribution")
+    parser.add_argument("--modes", nargs="+", choices=("neural", "text", "hybrid"), default=["neural", "text"])
+    parser.add_argument("--faculties-ratio", type=float, default=0.1)
+    parser.add_argument("--max-locations", type=int, default=2)
+    parser.add_argument("--top", type=int, default=5)
+    parser.add_argument("--encoder", choices=("stub",) + BACKENDS, default="stub", help="model of the in-process app")
+    parser.add_argument("--docs", type=int, default=40, help="synthetic documents of the in-process app")
+    parser.add_argument("--pages", type=int, default=10, help="pages per synthetic document")
+    parser.add_argument("--no-result-cache", action="store_true", help="disable the result cache of the in-process app")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+    if not args.concurrency and not args.rate:
+        args.concurrency = [1, 4, 16, 64]
+
+    result = asyncio.run(run(args))
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,149 @@
+"""
+Recall-vs-latency comparison of the Qdrant storage settings supported by
+``backend.qdrant_upload.collection_params``.
+
+Vectors are read from the served collection (or generated with ``--synthetic``),
+a held-out sample is used as queries, and exact nearest neighbours computed with
+numpy are the ground truth. Every setting is loaded into a temporary collection
+on the Qdrant server and queried with each search parameter combination.
+
+Quantization and HNSW settings are ignored by Qdrant's local mode, so this needs
+a running server:
+
+    python benchmarks/quantization.py --points 20000 --queries 200 --output tmp/quantization.json
+"""
+import json
+import time
+import argparse
+
+import numpy as np
+from qdrant_client import QdrantClient
+from qdrant_client.models import SearchParams, QuantizationSearchParams
+
+from backend.qdrant_upload import collection_params
+from config.config import COLLECTION_NAME, VECTOR_SIZE, SEARCH_HNSW_EF
+
+BENCH_COLLECTION = "bench_quantization"
+
+# (name, quantization, on_disk, [(oversampling, rescore), ...])
+SETTINGS = [
+    ("float32", "none", False, [(None, None)]),
+    ("float32 on-disk", "none", True, [(None, None)]),
+    ("scalar int8", "scalar", False, [(1.0, False), (1.0, True), (2.0, True)]),
+    ("scalar int8 + on-disk originals", "scalar", True, [(1.0, True), (2.0, True)]),
+    ("binary", "binary", False, [(1.0, False), (2.0, True), (4.0, True)]),
+    ("binary + on-disk originals", "binary", True, [(2.0, True), (4.0, True)]),
+]
+
+
+def load_vectors(client: QdrantClient, points: int) -> np.ndarray:
+    vectors = []
+    offset = None
+    while len(vectors) < points:
+        batch, offset = client.scroll(
+            collection_name=COLLECTION_NAME,
+            limit=min(1000, points - len(vectors)),
+            offset=offset,
+            with_payload=False,
+            with_vectors=True,
+        )
+        vectors.extend(point.vector for point in batch)
+        if offset is None:
+            break
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def synthetic_vectors(points: int, seed: int = 0) -> np.ndarray:
+    # กลุ่มเวกเตอร์รอบ ๆ centroid เพื่อให้ใกล้เคียงข้อมูลจริงมากกว่าสุ่มล้วน
+    rng = np.random.default_rng(seed)
+    centroids = rng.standard_normal((64, VECTOR_SIZE)).astype(np.float32)
+    vectors = centroids[rng.integers(0, len(centroids), points)] + 0.6 * rng.standard_normal((points, VECTOR_SIZE)).astype(np.float32)
+    return vectors
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def wait_indexed(client: QdrantClient, timeout: float = 600) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        info = client.get_collection(BENCH_COLLECTION)
+        if info.status.value == "green" and (info.indexed_vectors_count or 0) >= (info.points_count or 0):
+            return
+        time.sleep(1)
+    raise TimeoutError(f"'{BENCH_COLLECTION}' was not indexed within {timeout}s")
+
+
+def run(host: str, points: int, queries: int, top: int, synthetic: bool) -> list:
+    client = QdrantClient(host, timeout=300)
+    data = synthetic_vectors(points + queries) if synthetic else load_vectors(client, points + queries)
+    data = normalize(data)
+    base, query_vectors = data[queries:], data[:queries]
+    truth = np.argsort(-(query_vectors @ base.T), axis=1)[:, :top]
+
+    results = []
+    for name, quantization, on_disk, search_variants in SETTINGS:
+        if client.collection_exists(BENCH_COLLECTION):
+            client.delete_collection(BENCH_COLLECTION)
+        client.create_collection(
+            collection_name=BENCH_COLLECTION,
+            **collection_params(quantization=quantization, on_disk=on_disk),
+        )
+        client.upload_collection(
+            collection_name=BENCH_COLLECTION,
+            vectors=base,
+            ids=list(range(len(base))),
+            batch_size=256,
+        )
+        wait_indexed(client)
+
+        for oversampling, rescore in search_variants:
+            quantization_params = None
+            if oversampling is not None:
+                quantization_params = QuantizationSearchParams(oversampling=oversampling, rescore=rescore)
+            params = SearchParams(hnsw_ef=SEARCH_HNSW_EF, quantization=quantization_params)
+
+            latencies, hits = [], 0
+            for vector, expected in zip(query_vectors, truth):
+                started = time.perf_counter()
+                found = client.query_points(BENCH_COLLECTION, query=vector.tolist(), limit=top, search_params=params).points
+                latencies.append((time.perf_counter() - started) * 1000)
+                hits += len(set(point.id for point in found) & set(expected.tolist()))
+
+            ram_bytes = {"none": 4, "scalar": 1, "binary": 1 / 8}[quantization] * VECTOR_SIZE * len(base)
+            if quantization == "none" and on_disk:
+                ram_bytes = 0
+            elif quantization != "none" and not on_disk:
+                ram_bytes += 4 * VECTOR_SIZE * len(base)
+            results.append({
+                "setting": name,
+                "quantization": quantization,
+                "on_disk": on_disk,
+                "oversampling": oversampling,
+                "rescore": rescore,
+                f"recall@{top}": hits / (len(query_vectors) * top),
+                "p50_ms": float(np.percentile(latencies, 50)),
+                "p95_ms": float(np.percentile(latencies, 95)),
+                "vector_ram_mb": ram_bytes / 2 ** 20,
+            })
+            print(json.dumps(results[-1], ensure_ascii=False))
+
+    client.delete_collection(BENCH_COLLECTION)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="http://localhost:6333")
+    parser.add_argument("--points", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--synthetic", action="store_true", help="use generated vectors instead of the served collection")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    results = run(args.host, args.points, args.queries, args.top, args.synthetic)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
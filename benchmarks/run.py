@@ -0,0 +1,212 @@
+"""
+Offline benchmark of the whole pipeline: extraction, upload, and search.
+
+Everything runs in a temporary directory with no network:
+- a synthetic Thai/English PDF corpus from ``benchmarks.harness``,
+- Qdrant in local (in-process) mode instead of the server,
+- ``StubEncoder`` as the model, or a real backend with ``--encoder torch|onnx|int8``.
+
+It reports pages/s of ``extract_pages`` (one process and a process pool), vectors/s
+of ``VectorUploader.upload`` (a cold upload and a rebuild served from the embedding
+store), p50/p95/p99 search latency per mode and number of locations, and QPS at
+each concurrency level. With the stub encoder the numbers measure the pipeline
+around the model; use a real backend to include inference.
+
+    python benchmarks/run.py --docs 40 --pages 10 --output tmp/bench.json
+
+Local mode ignores payload indexes, HNSW and quantization settings, so search
+latencies are comparable across commits of this repository, not with a Qdrant server.
+"""
+import os
+import json
+import time
+import asyncio
+import argparse
+import platform
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from qdrant_client import QdrantClient
+
+from backend.extract_minio import extract_pages, _safe_extract_pages
+from backend.qdrant_upload import VectorUploader
+from backend.lexical_index import LexicalIndex
+from backend.embedding_store import EmbeddingStore
+from backend.embedding_cache import QueryEmbeddingCache
+from backend.nerual_search import NeuralSearcher
+from backend.text_search import TextSearcher
+from backend.hybrid_search import HybridSearcher
+from backend.encoder import BACKENDS, load_encoder
+from backend.utils import model_version
+from benchmarks.harness import FACULTIES, StubEncoder, make_pdf, synthetic_corpus, synthetic_queries, local_clients, write_jsonl, percentiles, git_commit
+
+BENCH_COLLECTION = "bench"
+MODES = ("neural", "text", "hybrid")
+
+
+def bench_extract(pdfs: list, workers: int) -> tuple:
+    pages = []
+    started = time.perf_counter()
+    for metadata, pdf_bytes in pdfs:
+        pages.extend(extract_pages(pdf_bytes, metadata))
+    sequential = time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pooled = [page for result in pool.map(_safe_extract_pages, [b for _, b in pdfs], [m for m, _ in pdfs]) for page in result or []]
+    parallel = time.perf_counter() - started
+    assert len(pooled) == len(pages)
+
+    return pages, {
+        "documents": len(pdfs),
+        "pages": len(pages),
+        "bytes": sum(len(b) for _, b in pdfs),
+        "sequential_s": sequential,
+        "sequential_pages_per_s": len(pages) / sequential,
+        "workers": workers,
+        "parallel_s": parallel,
+        "parallel_pages_per_s": len(pages) / parallel,
+    }
+
+
+def bench_upload(workdir: str, json_path: str, model: object) -> dict:
+    client = QdrantClient(path=os.path.join(workdir, "qdrant"))
+    store = EmbeddingStore(model_version(model), directory=os.path.join(workdir, "embeddings"))
+    generation_path = os.path.join(workdir, "index_generation")
+    result = {}
+    try:
+        # cold: ทุก passage ต้อง encode, rebuild: vector มาจาก embedding store
+        for name, collection in (("cold", BENCH_COLLECTION), ("rebuild", f"{BENCH_COLLECTION}_rebuild")):
+            uploader = VectorUploader(json_path, collection, model, qdrant_client=client, embedding_store=store, generation_path=generation_path)
+            started = time.perf_counter()
+            uploader.upload(full=True)
+            seconds = time.perf_counter() - started
+            vectors = client.count(collection_name=collection).count
+            result[name] = {"vectors": vectors, "seconds": seconds, "vectors_per_s": vectors / seconds}
+        result["embedding_store"] = store.stats()
+    finally:
+        client.close()
+    return result
+
+
+async def timed(search, query: str, location: list, top: int) -> float:
+    started = time.perf_counter()
+    await search(query=query, location=location, top=top)
+    return time.perf_counter() - started
+
+
+async def bench_search(searchers: dict, neural: NeuralSearcher, queries: list, locations: list, top: int, warmup: int) -> dict:
+    result = {}
+    for mode, searcher in searchers.items():
+        for count in locations:
+            location = FACULTIES[:count] or None
+            for query in queries[:warmup]:
+                await searcher.asearch(query=query, location=location, top=top)
+            # ล้าง cache ของ query vector เพื่อให้ทุกชุดวัดการ encode เท่ากัน
+            neural.cache.clear()
+            seconds = [await timed(searcher.asearch, query, location, top) for query in queries]
+            result[f"{mode}/locations={count}"] = {"mode": mode, "locations": count, **percentiles(seconds)}
+    return result
+
+
+async def bench_throughput(searchers: dict, neural: NeuralSearcher, queries: list, levels: list, top: int) -> list:
+    result = []
+    location = FACULTIES[:1]
+    for mode, searcher in searchers.items():
+        for concurrency in levels:
+            neural.cache.clear()
+            pending = iter(queries)
+            seconds = []
+
+            async def worker():
+                for query in pending:
+                    seconds.append(await timed(searcher.asearch, query, location, top))
+
+            started = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+            wall = time.perf_counter() - started
+            result.append({"mode": mode, "concurrency": concurrency, "qps": len(seconds) / wall, **percentiles(seconds)})
+    return result
+
+
+async def bench_searchers(workdir: str, model: object, queries: list, locations: list, levels: list, top: int, warmup: int) -> dict:
+    qdrant_client, async_client = local_clients(workdir)
+    neural = NeuralSearcher(BENCH_COLLECTION, model, qdrant_client=qdrant_client, async_client=async_client, cache=QueryEmbeddingCache())
+    text = TextSearcher(os.path.join(workdir, "lexical"))
+    hybrid = HybridSearcher(neural, text)
+    searchers = {"neural": neural, "text": text, "hybrid": hybrid}
+    try:
+        return {
+            "latency": await bench_search(searchers, neural, queries, locations, top, warmup),
+            "throughput": await bench_throughput(searchers, neural, queries, levels, top),
+        }
+    finally:
+        hybrid.executor.shutdown()
+        neural.executor.shutdown()
+        neural.qdrant_client.close()
+        await async_client.close()
+
+
+def run(documents: int, pages: int, words: int, queries: int, encoder: str, workers: int, locations: list, concurrency: list, top: int, warmup: int, seed: int) -> dict:
+    model = StubEncoder() if encoder == "stub" else load_encoder(backend=encoder)
+    corpus = synthetic_corpus(documents, pages, words=words, seed=seed)
+    pdfs = [(metadata, make_pdf(page_lines)) for metadata, page_lines in corpus]
+    questions = synthetic_queries(queries, seed=seed + 1)
+
+    with tempfile.TemporaryDirectory(prefix="dsi324-bench-") as workdir:
+        extracted, extract = bench_extract(pdfs, workers)
+        json_path = os.path.join(workdir, "extract.jsonl")
+        write_jsonl(json_path, extracted)
+
+        upload = bench_upload(workdir, json_path, model)
+
+        started = time.perf_counter()
+        LexicalIndex.build(json_path, index_dir=os.path.join(workdir, "lexical"), generation_path=os.path.join(workdir, "index_generation"))
+        lexical = {"pages": len(extracted), "seconds": time.perf_counter() - started}
+
+        search = asyncio.run(bench_searchers(workdir, model, questions, locations, concurrency, top, warmup))
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "encoder": encoder,
+            "model": model_version(model),
+            "documents": documents,
+            "pages_per_document": pages,
+            "words_per_page": words,
+            "queries": queries,
+            "top": top,
+            "seed": seed,
+        },
+        "extract": extract,
+        "upload": upload,
+        "lexical_index": lexical,
+        **search,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=40, help="synthetic PDF documents")
+    parser.add_argument("--pages", type=int, default=10, help="pages per document")
+    parser.add_argument("--words", type=int, default=180, help="words per page")
+    parser.add_argument("--queries", type=int, default=200, help="queries per latency measurement")
+    parser.add_argument("--encoder", choices=("stub",) + BACKENDS, default="stub")
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1), help="processes used for parallel extraction")
+    parser.add_argument("--locations", type=int, nargs="+", default=[0, 1, 3], help="numbers of faculties to filter on")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--top", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=10, help="queries run before each latency measurement")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    result = run(args.docs, args.pages, args.words, args.queries, args.encoder, args.workers, args.locations, args.concurrency, args.top, args.warmup, args.seed)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,115 @@
+"""
+Import time and time-to-first-request of the FastAPI service.
+
+Import time is measured in fresh interpreters (``import backend.service``),
+together with the slowest modules reported by ``python -X importtime``. The
+service is then started with uvicorn and polled until ``/healthz`` answers
+(live), ``/readyz`` answers 200 (model loaded and warmed up) and the first
+neural search returns. The model, Qdrant and MinIO settings come from the
+environment, as for the service itself.
+
+    python benchmarks/startup.py --runs 5 --output tmp/startup.json
+
+Use ``--max-import-seconds`` / ``--max-live-seconds`` to fail (exit status 1)
+when startup regresses past a budget.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+import statistics
+
+import httpx
+
+from config.config import ROOT_DIR
+
+
+def import_seconds(runs: int) -> list:
+    code = "import time; t = time.perf_counter(); import backend.service; print(time.perf_counter() - t)"
+    return [
+        float(subprocess.run([sys.executable, "-c", code], cwd=ROOT_DIR, capture_output=True, text=True, check=True).stdout.split()[-1])
+        for _ in range(runs)
+    ]
+
+
+def slowest_imports(top: int) -> list:
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import backend.service"],
+        cwd=ROOT_DIR, capture_output=True, text=True, check=True,
+    ).stderr
+    modules = []
+    for line in stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        modules.append((int(cumulative), name.strip()))
+    return [{"module": name, "cumulative_ms": us / 1000} for us, name in sorted(modules, reverse=True)[:top]]
+
+
+def wait_for(client: httpx.Client, path: str, status: int, started: float, timeout: float, process: subprocess.Popen) -> float:
+    while time.perf_counter() - started < timeout:
+        if process.poll() is not None:
+            raise RuntimeError(f"The service exited with status {process.returncode}")
+        try:
+            if client.get(path).status_code == status:
+                return time.perf_counter() - started
+        except httpx.TransportError:
+            pass
+        time.sleep(0.05)
+    raise TimeoutError(f"{path} did not return {status} within {timeout}s")
+
+
+def first_request(port: int, query: str, timeout: float) -> dict:
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.service:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT_DIR,
+        env={**os.environ, "PYTHONPATH": ROOT_DIR},
+    )
+    started = time.perf_counter()
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=timeout) as client:
+            live = wait_for(client, "/healthz", 200, started, timeout, process)
+            ready = wait_for(client, "/readyz", 200, started, timeout, process)
+            response = client.get("/api/search", params={"q": query, "mode": "neural", "top": 5})
+            return {
+                "live_s": live,
+                "ready_s": ready,
+                "first_search_s": time.perf_counter() - started,
+                "first_search_status": response.status_code,
+            }
+    finally:
+        process.terminate()
+        process.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters used to measure import time")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--query", default="อาชีพ")
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--skip-serve", action="store_true", help="only measure import time")
+    parser.add_argument("--max-import-seconds", type=float)
+    parser.add_argument("--max-live-seconds", type=float)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    seconds = import_seconds(args.runs)
+    result = {
+        "import_median_s": statistics.median(seconds),
+        "import_runs_s": seconds,
+        "slowest_imports": slowest_imports(10),
+    }
+    if not args.skip_serve:
+        result.update(first_request(args.port, args.query, args.timeout))
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+    failed = (args.max_import_seconds is not None and result["import_median_s"] > args.max_import_seconds) or \
+        (args.max_live_seconds is not None and result.get("live_s", 0) > args.max_live_seconds)
+    sys.exit(1 if failed else 0)
@@ -10,9 +10,90 @@ CREDENTIALS_DIR = os.path.join(CONFIG_DIR, "credentials")
 FILE_CREDENTIALS = os.path.join(CREDENTIALS_DIR, "oauth-client-id.json")
 
 FILE_EXTRACT = os.path.join(DATA_DIR, "extract_data.jsonl")
+FILE_EXTRACT_MANIFEST = os.path.join(DATA_DIR, "extract_manifest.json")
+FILE_DOCUMENTS = os.path.join(DATA_DIR, "documents.json")
+FILE_INDEX_GENERATION = os.path.join(DATA_DIR, "index_generation")
 COLLECTION_NAME = "qdrant_collection"
+QDRANT_HOST = os.getenv("QDRANT_HOST", "http://localhost:6333")
 BUCKET_NAME = "document"
 
+# -------------------------------- Extraction -------------------------------- #
+EXTRACT_FETCH_WORKERS = int(os.getenv("EXTRACT_FETCH_WORKERS", 8))
+EXTRACT_PARSE_WORKERS = int(os.getenv("EXTRACT_PARSE_WORKERS", os.cpu_count() or 1))
+EXTRACT_MAX_IN_FLIGHT = int(os.getenv("EXTRACT_MAX_IN_FLIGHT", 64))
+
+# --------------------------------- Ingestion -------------------------------- #
+UPLOAD_BATCH_SIZE = int(os.getenv("UPLOAD_BATCH_SIZE", 256))
+ENCODE_BATCH_SIZE = int(os.getenv("ENCODE_BATCH_SIZE", 64))
+UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", 2))
+UPLOAD_QUEUE_SIZE = int(os.getenv("UPLOAD_QUEUE_SIZE", 4))
+ENCODE_SORT_WINDOW = int(os.getenv("ENCODE_SORT_WINDOW", 8))
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", 512))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", 64))
+EMBEDDING_STORE_DIR = os.getenv("EMBEDDING_STORE_DIR", os.path.join(DATA_DIR, "embeddings"))
+EMBEDDING_STORE_COMPACT_RATIO = float(os.getenv("EMBEDDING_STORE_COMPACT_RATIO", 0.2))
+
+# ---------------------------------- Encoder --------------------------------- #
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "BAAI/bge-m3")
+ENCODER_BACKEND = os.getenv("ENCODER_BACKEND", "torch")  # torch | onnx | int8
+ENCODER_DEVICE = os.getenv("ENCODER_DEVICE", "auto")  # auto | cuda | cpu
+ENCODER_THREADS = int(os.getenv("ENCODER_THREADS", 0))
+
+# ------------------------------ Vector Storage ------------------------------ #
+VECTOR_SIZE = 1024
+QDRANT_QUANTIZATION = os.getenv("QDRANT_QUANTIZATION", "none")  # none | scalar | binary
+QDRANT_ON_DISK = os.getenv("QDRANT_ON_DISK", "false").lower() == "true"
+QDRANT_HNSW_M = int(os.getenv("QDRANT_HNSW_M", 16))
+QDRANT_HNSW_EF_CONSTRUCT = int(os.getenv("QDRANT_HNSW_EF_CONSTRUCT", 100))
+SEARCH_HNSW_EF = int(os.getenv("SEARCH_HNSW_EF", 128))
+SEARCH_OVERSAMPLING = float(os.getenv("SEARCH_OVERSAMPLING", 2.0))
+SEARCH_RESCORE = os.getenv("SEARCH_RESCORE", "true").lower() == "true"
+# หน้าที่ยาวกว่า CHUNK_MAX_TOKENS มีหลาย point จึงขอผลลัพธ์เพิ่มเป็นกี่เท่าของ top ก่อนเหลือ chunk ที่ดีที่สุดต่อหน้า
+SEARCH_CHUNK_OVERFETCH = int(os.getenv("SEARCH_CHUNK_OVERFETCH", 4))
+# payload ที่ searcher ดึงมาต่อผลลัพธ์ ส่วน metadata ของเอกสารจะ join จาก FILE_DOCUMENTS
+SEARCH_PAYLOAD_FIELDS = os.getenv("SEARCH_PAYLOAD_FIELDS", "doc_id,faculty,page,chunk").split(",")
+
+# -------------------------------- Query Cache ------------------------------- #
+QUERY_CACHE_MAX_ENTRIES = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", 2048))
+QUERY_CACHE_MAX_BYTES = int(os.getenv("QUERY_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", 3600))
+
+# ------------------------------- Result Cache ------------------------------- #
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", 1024))
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", 300))
+
+# ------------------------------- Lexical Index ------------------------------ #
+LEXICAL_INDEX_DIR = os.path.join(DATA_DIR, "lexical_index")
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# ------------------------------- Hybrid Search ------------------------------ #
+HYBRID_RRF_K = 60
+HYBRID_WEIGHT = 0.5
+HYBRID_DEPTH = 50
+# เพดานของ top และ depth ต่อ location ที่ request หนึ่งขอได้
+SEARCH_MAX_TOP = int(os.getenv("SEARCH_MAX_TOP", 100))
+HYBRID_MAX_DEPTH = int(os.getenv("HYBRID_MAX_DEPTH", 200))
+
+# ---------------------------------- Service --------------------------------- #
+# encode ข้อความสั้น ๆ หนึ่งครั้งหลังโหลดโมเดล ให้ request แรกไม่ต้องรอ warm-up
+SERVICE_WARMUP = os.getenv("SERVICE_WARMUP", "true").lower() == "true"
+
+# -------------------------------- Concurrency ------------------------------- #
+ENCODE_WORKERS = int(os.getenv("ENCODE_WORKERS", 2))
+ENCODE_MAX_PENDING = int(os.getenv("ENCODE_MAX_PENDING", 64))
+ENCODE_MAX_BATCH = int(os.getenv("ENCODE_MAX_BATCH", 32))
+ENCODE_BATCH_WINDOW_MS = float(os.getenv("ENCODE_BATCH_WINDOW_MS", 5))
+SEARCH_MAX_CONCURRENCY = int(os.getenv("SEARCH_MAX_CONCURRENCY", 32))
+SEARCH_MAX_QUEUE = int(os.getenv("SEARCH_MAX_QUEUE", 128))
+
+# ------------------------------- Faculty Index ------------------------------ #
+FACULTY_REFRESH_INTERVAL = float(os.getenv("FACULTY_REFRESH_INTERVAL", 300))
+# POST /api/faculties/refresh ไม่ list bucket ใหม่ถ้าเพิ่ง refresh ไปไม่ถึงกี่วินาที
+FACULTY_REFRESH_MIN_AGE = float(os.getenv("FACULTY_REFRESH_MIN_AGE", 30))
+FACULTY_CACHE_MAX_AGE = 60
+
 BUCKET_POLICY = """
 {
     "Version": "2012-10-17",
@@ -32,8 +32,10 @@ const App = () => {
         if (event.key === 'Enter') {
             const newTop = parseInt(event.target.value, 10);
             if (!isNaN(newTop)) {
-                console.log("New top value:", newTop); 
-                setTop(newTop);
+                // service รับ top ได้ 1 ถึง 100 (SEARCH_MAX_TOP)
+                const clampedTop = Math.min(Math.max(newTop, 1), 100);
+                console.log("New top value:", clampedTop);
+                setTop(clampedTop);
             }
         }
     };
@@ -160,7 +162,9 @@ const App = () => {
     }, [selectedItem, query]);
 
     /* --------------------------------- Search --------------------------------- */
+    const searchId = useRef(0);
     const handleSearch = useCallback(async (q, locations) => {
+        const id = ++searchId.current;
         if (!q.trim()) {
             setResults([]);
             return;
@@ -174,12 +178,49 @@ const App = () => {
                     .map(loc => `&location=${encodeURIComponent(loc.value)}`)
                     .join('');
             }
+            const url = `http://localhost:8000/api/search?q=${encodeURIComponent(q)}&neural=${neural}&top=${top}${locationParam}`;
 
-            const response = await fetch(
-                `http://localhost:8000/api/search?q=${encodeURIComponent(q)}&neural=${neural}&top=${top}${locationParam}`
-            );
-            const data = await response.json();
-            setResults(data.result);
+            if (!locations || locations.length < 2) {
+                const response = await fetch(url);
+                const data = await response.json();
+                if (id === searchId.current) {
+                    setResults(data.result);
+                }
+                return;
+            }
+
+            // หลายคณะ: รับผลแบบ NDJSON แสดงผลของแต่ละคณะทันทีที่พร้อม ไม่ต้องรอคณะที่ช้าที่สุด
+            const response = await fetch(`${url}&stream=true`);
+            if (!response.ok) {
+                // 503 (server busy / model loading) หรือ 4xx ส่ง JSON error มา ไม่ใช่ NDJSON
+                const data = await response.json().catch(() => ({}));
+                throw new Error(`${response.status} ${data.detail ? JSON.stringify(data.detail) : response.statusText}`);
+            }
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            setResults([]);
+            while (true) {
+                const { done, value } = await reader.read();
+                if (id !== searchId.current) {
+                    // มีการค้นหาใหม่แล้ว เลิกอ่านผลของการค้นหานี้
+                    reader.cancel();
+                    return;
+                }
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+                const lines = buffer.split('\n');
+                buffer = lines.pop();
+                for (const line of lines) {
+                    if (!line) continue;
+                    const record = JSON.parse(line);
+                    if (record.result) {
+                        setResults(prev => [...prev, ...record.result]);
+                    } else if (record.error) {
+                        console.error("Error fetching data:", record.error);
+                    }
+                }
+            }
         } catch (error) {
             console.error("Error fetching data:", error);
         }
@@ -307,7 +348,7 @@ const App = () => {
                             id="top-input"
                             type="number"
                             min="1"
-                            max="1000"
+                            max="100"
                             defaultValue={top}
                             onKeyDown={handleKeyDown}
                             style={{ width: '60px', marginLeft: '8px' }}